@@ -1,9 +1,22 @@
 from django.views.generic.base import TemplateView
 
+from core import pagecache
 
-class AuthorPage(TemplateView):
+# Статичные страницы меняются только с выкладкой.
+ABOUT_CACHE_TIMEOUT = 60 * 10
+
+
+class CachedPage(TemplateView):
+    """Страница, которую анонимы получают из core.pagecache."""
+
+    def get(self, request, *args, **kwargs):
+        pagecache.depends_on(request, timeout=ABOUT_CACHE_TIMEOUT)
+        return super().get(request, *args, **kwargs)
+
+
+class AuthorPage(CachedPage):
     template_name = 'about/author.html'
 
 
-class TechPage(TemplateView):
+class TechPage(CachedPage):
     template_name = 'about/tech.html'
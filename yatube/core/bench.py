@@ -0,0 +1,46 @@
+"""Общие помощники для команд-бенчмарков."""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+
+def scratch_caches():
+    """Отдельный locmem-кеш на каждый алиас из CACHES."""
+    return {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'scratch-{alias}',
+        }
+        for alias in settings.CACHES
+    }
+
+
+@contextmanager
+def scratch_database():
+    """Поднимает временную тестовую БД и удаляет её после замеров.
+
+    Кеши на это время тоже подменяются: общий кеш хоста нельзя ни
+    чистить, ни заполнять версиями и фрагментами из временных данных —
+    их pk совпадают с настоящими.
+    """
+    old_name = connection.settings_dict['NAME']
+    with override_settings(CACHES=scratch_caches()):
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, repeat=5):
+    """Возвращает медианное время вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,515 @@
+"""Кеши: общий для процессов SQLiteCache и TieredCache перед ним.
+
+SQLiteCache — кеш в файле SQLite, общий для всех процессов сервера
+на машине.
+
+В отличие от LocMemCache, запись и инвалидация в одном процессе сразу
+видны остальным, а память не растёт с числом процессов. Объём
+ограничен OPTIONS['MAX_BYTES']: при переполнении вытесняются давно не
+читавшиеся ключи (приблизительный LRU — время чтения обновляется не
+чаще раза в LRU_RESOLUTION секунд, чтобы чтения не превращались в
+записи). Целые числа хранятся как INTEGER, поэтому incr — один
+атомарный UPDATE, а incr_many — один UPDATE на все ключи.
+
+TieredCache держит маленький LRU в памяти процесса (L1) перед любым
+настроенным кешем (L2). Удаления, incr (то есть сдвиг версий
+core.versions) и clear увеличивают счётчик поколений в общем
+mmap-файле; каждый процесс сверяет его при чтении — это обращение
+к памяти, а не системный вызов — и при расхождении очищает свой L1.
+incr_many сдвигает все ключи с одной рассылкой.
+Перезапись ключа через set не рассылается: другие процессы увидят
+новое значение не позже чем через L1_TIMEOUT.
+
+lock()/unlock() у обоих бэкендов — короткие блокировки для
+core.singleflight; TieredCache берёт их прямо в L2.
+
+SQLiteCache нужна библиотека SQLite не старше MIN_SQLITE_VERSION:
+запись идёт через UPSERT (3.24), incr — через UPDATE ... RETURNING
+(3.35). Со старой библиотекой бэкенд не создаётся.
+"""
+import fcntl
+import mmap
+import os
+import pickle
+import random
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Тип значения в колонке kind.
+PICKLED = 0
+INTEGER = 1
+
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+LRU_RESOLUTION = 1.0
+EVICT_BATCH = 100
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB, kind INTEGER NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_stats (total INTEGER NOT NULL)',
+    'INSERT INTO cache_stats (total) '
+    'SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM cache_stats)',
+    # Общий объём ведут триггеры, чтобы не считать SUM() на каждой записи.
+    'CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_stats SET total = total + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_stats SET total = total - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_size_update '
+    'AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_stats SET total = total - old.size + new.size; END',
+)
+
+UPSERT = (
+    'INSERT INTO cache (key, value, kind, expires, accessed, size) '
+    'VALUES (?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+    'kind = excluded.kind, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size'
+)
+
+
+def _encode(value):
+    if type(value) is int:
+        return value, INTEGER, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, PICKLED, len(data)
+
+
+def _decode(value, kind):
+    if kind == INTEGER:
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Бэкенд кеша Django; LOCATION — путь к файлу базы кеша."""
+
+    def __init__(self, location, params):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            required = '.'.join(map(str, MIN_SQLITE_VERSION))
+            raise ImproperlyConfigured(
+                f'SQLiteCache нужна SQLite {required} или новее, '
+                f'установлена {sqlite3.sqlite_version}.')
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        # После вытеснения остаётся столько от MAX_BYTES.
+        self.evict_to = float(options.get('EVICT_TO', 0.9))
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        local = self._local
+        # После fork соединение родителя использовать нельзя.
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = OFF')
+            for statement in SCHEMA:
+                db.execute(statement)
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        data, kind, size = _encode(value)
+        expires = self.get_backend_timeout(timeout)
+        return key, data, kind, expires, now, len(key) + size
+
+    def _touch_accessed(self, keys, now):
+        self.db.executemany(
+            'UPDATE cache SET accessed = ? WHERE key = ?',
+            ((now, key) for key in keys))
+
+    def _fetch(self, keys):
+        """{ключ: значение} живых ключей; обновляет время чтения."""
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.db.execute(
+            'SELECT key, value, kind, expires, accessed FROM cache '
+            f'WHERE key IN ({placeholders})', list(keys)).fetchall()
+        found, stale = {}, []
+        for key, value, kind, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = _decode(value, kind)
+            if now - accessed > LRU_RESOLUTION:
+                stale.append(key)
+        if stale:
+            self._touch_accessed(stale, now)
+        return found
+
+    def _evict(self):
+        total, = self.db.execute('SELECT total FROM cache_stats').fetchone()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * self.evict_to
+        self.db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),))
+        while total > target:
+            deleted = self.db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (EVICT_BATCH,)).rowcount
+            total, = self.db.execute(
+                'SELECT total FROM cache_stats').fetchone()
+            if not deleted:
+                break
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._fetch(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self.db.execute(UPSERT, self._row(key, value, timeout, time.time()))
+        self._evict()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [self._row(self._key(key, version), value, timeout, now)
+                for key, value in data.items()]
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.executemany(UPSERT, rows)
+        self._evict()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает, только если ключа нет или он просрочен."""
+        key = self._key(key, version)
+        now = time.time()
+        added = self.db.execute(
+            UPSERT + ' WHERE cache.expires IS NOT NULL '
+            'AND cache.expires <= ?',
+            (*self._row(key, value, timeout, now), now)).rowcount
+        if added:
+            self._evict()
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        row = self.db.execute(
+            'UPDATE cache SET value = value + ?, accessed = ? '
+            'WHERE key = ? AND kind = ? '
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, time.time(), key, INTEGER, time.time())).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def incr_many(self, keys, delta=1, version=None):
+        """incr для многих ключей одним UPDATE.
+
+        Возвращает {ключ: новое значение}; отсутствующих ключей в нём нет.
+        """
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.db.execute(
+            'UPDATE cache SET value = value + ?, accessed = ? '
+            f'WHERE key IN ({placeholders}) AND kind = ? '
+            'AND (expires IS NULL OR expires > ?) RETURNING key, value',
+            (delta, now, *keys, INTEGER, now)).fetchall()
+        return {keys[key]: value for key, value in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return bool(self.db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())).rowcount)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self.db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        return bool(self.db.execute(
+            'DELETE FROM cache WHERE key = ?', (key,)).rowcount)
+
+    def lock(self, key, timeout, version=None):
+        """Берёт блокировку на timeout секунд.
+
+        Возвращает токен для unlock() или None, если блокировка занята.
+        """
+        token = random.getrandbits(62)
+        return token if self.add(key, token, timeout, version) else None
+
+    def unlock(self, key, token, version=None):
+        """Снимает блокировку, только если её не успел взять другой."""
+        key = self._key(key, version)
+        return bool(self.db.execute(
+            'DELETE FROM cache WHERE key = ? AND kind = ? AND value = ?',
+            (key, INTEGER, token)).rowcount)
+
+    def delete_many(self, keys, version=None):
+        self.db.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            ((self._key(key, version),) for key in keys))
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открывать файл на каждый запрос
+        # дороже, чем держать его.
+        pass
+
+
+_MISSING = object()
+GENERATION = struct.Struct('Q')
+
+# L1 и счётчик поколений — на процесс, а не на поток: caches отдаёт
+# каждому потоку свой экземпляр бэкенда.
+_l1_stores = {}
+_generations = {}
+_setup_lock = threading.Lock()
+
+
+class Generation:
+    """Счётчик поколений в файле, отображённом в память всех процессов."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < GENERATION.size:
+            os.ftruncate(self.fd, GENERATION.size)
+        self.map = mmap.mmap(self.fd, GENERATION.size)
+
+    @property
+    def value(self):
+        return GENERATION.unpack_from(self.map)[0]
+
+    def bump(self):
+        # Блокировка нужна только писателям: два одновременных +1
+        # не должны слиться в один.
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            value = self.value + 1
+            GENERATION.pack_into(self.map, 0, value)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return value
+
+
+class L1Store:
+    """Ограниченный LRU с коротким TTL; значения хранятся в pickle."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def sync(self, generation):
+        if generation != self.generation:
+            with self.lock:
+                self.entries.clear()
+                self.generation = generation
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=None):
+        """timeout — срок из set() в L2; L1 не держит ключ дольше него."""
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            self.delete(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class TieredCache(BaseCache):
+    """L1 в памяти процесса перед кешем OPTIONS['L2'].
+
+    LOCATION — путь к файлу счётчика поколений, общему для процессов.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options['L2']
+        with _setup_lock:
+            if location not in _generations:
+                _generations[location] = Generation(location)
+                _l1_stores[location] = L1Store(
+                    int(options.get('L1_MAX_ENTRIES', 1000)),
+                    float(options.get('L1_TIMEOUT', 2)),
+                )
+        self.generation = _generations[location]
+        self.l1 = _l1_stores[location]
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _l1(self):
+        self.l1.sync(self.generation.value)
+        return self.l1
+
+    def _key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _broadcast(self):
+        self.l1.sync(self.generation.bump())
+
+    def get(self, key, default=None, version=None):
+        l1 = self._l1()
+        value = l1.get(self._key(key, version))
+        if value is _MISSING:
+            value = self.l2.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            l1.set(self._key(key, version), value)
+        return value
+
+    def get_many(self, keys, version=None):
+        l1 = self._l1()
+        found, missing = {}, []
+        for key in keys:
+            value = l1.get(self._key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                l1.set(self._key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._l1().get(self._key(key, version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1().set(
+            self._key(key, version), value, self._timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        l1 = self._l1()
+        for key, value in data.items():
+            if key not in failed:
+                l1.set(self._key(key, version), value, self._timeout(timeout))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1().set(
+                self._key(key, version), value, self._timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1().delete(self._key(key, version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def lock(self, key, timeout, version=None):
+        return self.l2.lock(key, timeout, version=version)
+
+    def unlock(self, key, token, version=None):
+        return self.l2.unlock(key, token, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._broadcast()
+        self.l1.set(self._key(key, version), value)
+        return value
+
+    def incr_many(self, keys, delta=1, version=None):
+        """incr ключей keys с одной рассылкой поколения на все."""
+        if hasattr(self.l2, 'incr_many'):
+            values = self.l2.incr_many(keys, delta, version=version)
+        else:
+            values = {}
+            for key in keys:
+                try:
+                    values[key] = self.l2.incr(key, delta, version=version)
+                except ValueError:
+                    pass
+        # Рассылка и без найденных ключей: её ждут записи через set
+        # перед сдвигом (core.versions.bump).
+        self._broadcast()
+        for key, value in values.items():
+            self.l1.set(self._key(key, version), value)
+        return values
+
+    def delete(self, key, version=None):
+        result = self.l2.delete(key, version=version)
+        self._broadcast()
+        return result
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version=version)
+        self._broadcast()
+
+    def clear(self):
+        self.l2.clear()
+        self._broadcast()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
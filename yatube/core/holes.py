@@ -0,0 +1,66 @@
+"""Дырки в закешированных страницах для вошедших пользователей.
+
+Шаблон отмечает личную часть страницы тегом {% punch 'имя' ключ=... %}.
+Обычно тег просто рендерит шаблон дырки в текущем контексте, дополнив
+его контекстом дырки, так что представлению не нужно считать то же
+самое для себя. Когда
+страницу собирают для общего кеша (request.punch_holes), на месте
+дырки остаётся маркер-комментарий с именем и аргументами, а fill()
+перед отдачей рендерит каждую дырку для текущего пользователя.
+
+Пользовательский текст в шаблонах экранируется, поэтому подделать
+маркер через содержимое поста или комментария нельзя.
+"""
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = re.compile(r'<!--hole:(\w+)\?([^\s<>]*)-->')
+
+_holes = {}
+
+
+def hole(name, template_name):
+    """Регистрирует дырку: функция по запросу и аргументам маркера
+    возвращает контекст для шаблона дырки."""
+    def decorator(func):
+        _holes[name] = (template_name, func)
+        return func
+    return decorator
+
+
+def template_name(name):
+    return _holes[name][0]
+
+
+def marker(name, **kwargs):
+    return mark_safe(f'<!--hole:{name}?{urlencode(kwargs)}-->')
+
+
+def context(request, name, **kwargs):
+    """Контекст шаблона дырки name: аргументы и то, что вернула дырка."""
+    get_context = _holes[name][1]
+    result = dict(kwargs)
+    result.update(get_context(request, **kwargs))
+    return result
+
+
+def render(request, name, **kwargs):
+    return render_to_string(
+        template_name(name), context(request, name, **kwargs),
+        request=request)
+
+
+def fill(request, content):
+    """Заменяет маркеры в общем теле страницы личными фрагментами."""
+    return MARKER.sub(
+        lambda match: render(
+            request, match.group(1), **dict(parse_qsl(match.group(2)))),
+        content)
+
+
+@hole('header', 'includes/header.html')
+def header(request):
+    return {}
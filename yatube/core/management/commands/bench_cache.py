@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+def _worker(backend, location, options, seed, queue):
+    if backend == 'locmem':
+        cache = LocMemCache(location, {})
+    else:
+        cache = SQLiteCache(location, {})
+    rng = random.Random(seed)
+    value = 'x' * options['size']
+    hits = misses = 0
+    started = time.perf_counter()
+    for _ in range(options['requests']):
+        # Популярные ключи запрашиваются чаще, как страницы ленты.
+        key = f'fragment:{int(rng.paretovariate(0.6)) % options["keys"]}'
+        if cache.get(key) is None:
+            misses += 1
+            cache.set(key, value)
+        else:
+            hits += 1
+    queue.put((hits, misses, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает долю попаданий и задержку LocMemCache и общего '
+            'SQLiteCache при нескольких процессах-воркерах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=20_000)
+        parser.add_argument('--keys', type=int, default=20_000)
+        parser.add_argument('--size', type=int, default=2_000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for backend, location in (
+                    ('locmem', 'bench'),
+                    ('sqlite', os.path.join(directory, 'cache.sqlite3'))):
+                hits, misses, elapsed = self.run(backend, location, options)
+                total = hits + misses
+                self.stdout.write(
+                    f'{backend:>7}: попаданий {hits / total:6.1%}, '
+                    f'{elapsed / total * 1e6:7.1f} мкс на запрос')
+
+    def run(self, backend, location, options):
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        workers = [
+            context.Process(
+                target=_worker,
+                args=(backend, location, options, seed, queue))
+            for seed in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        results = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        return tuple(sum(column) for column in zip(*results))
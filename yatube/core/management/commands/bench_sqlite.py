@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_author_pub_date ON post (author_id, pub_date DESC)',
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность смешанной нагрузки '
+            'чтения и записи без PRAGMA и с settings.SQLITE_PRAGMAS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        for label, pragmas in (('default', {}),
+                               ('tuned', settings.SQLITE_PRAGMAS)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'])
+                reads, writes, locked = self.run_load(path, pragmas, options)
+            seconds = options['seconds']
+            self.stdout.write(
+                f'{label:>8}: {reads / seconds:9.0f} чтений/с, '
+                f'{writes / seconds:7.0f} записей/с, '
+                f'database is locked: {locked}')
+
+    def seed(self, path, rows):
+        db = sqlite3.connect(path)
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.executemany(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            ((i % 100, f'Пост {i}', i) for i in range(rows)))
+        db.commit()
+        db.close()
+
+    def run_load(self, path, pragmas, options):
+        totals = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def worker(write):
+            db = sqlite3.connect(path, check_same_thread=False)
+            apply_pragmas(db.cursor(), pragmas)
+            done = locked = 0
+            author = threading.get_ident() % 100
+            while time.monotonic() < deadline:
+                try:
+                    if write:
+                        db.execute(
+                            'INSERT INTO post (author_id, text, pub_date) '
+                            'VALUES (?, ?, ?)',
+                            (author, 'Новый пост', time.time()))
+                        db.commit()
+                    else:
+                        db.execute(
+                            'SELECT id, text FROM post WHERE author_id = ? '
+                            'ORDER BY pub_date DESC LIMIT 10',
+                            (author,)).fetchall()
+                    done += 1
+                except sqlite3.OperationalError:
+                    db.rollback()
+                    locked += 1
+            db.close()
+            with lock:
+                totals['writes' if write else 'reads'] += done
+                totals['locked'] += locked
+
+        threads = [
+            threading.Thread(target=worker, args=(False,))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=(True,))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['reads'], totals['writes'], totals['locked']
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = 'Показывает настройки SQLite, размер базы и журнала WAL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint',
+            action='store_true',
+            help='Перенести журнал в базу и обрезать его (TRUNCATE).',
+        )
+
+    def handle(self, *args, **options):
+        if options['checkpoint']:
+            busy, log, done = sqlite.checkpoint('TRUNCATE')
+            self.stdout.write(
+                f'Checkpoint: перенесено {done} из {log} страниц'
+                + (', база занята' if busy else ''))
+        for name, value in sqlite.health().items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Повторять каждые REPLICA_SYNC_INTERVAL секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICAS.')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                replicas.sync(alias)
+            self.stdout.write(
+                f'Реплики обновлены: {", ".join(settings.DATABASE_REPLICAS)}')
+            if not options['loop']:
+                return
+            time.sleep(settings.REPLICA_SYNC_INTERVAL)
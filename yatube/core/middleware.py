@@ -0,0 +1,138 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from . import pagecache, replicas, staticfiles
+from .queries import QueryBudgetExceeded, QueryInspector, check_budget
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Проверяет бюджеты запросов, если задан QUERY_BUDGET_MODE.
+
+    'warn' пишет нарушение в лог, 'raise' бросает QueryBudgetExceeded,
+    чтобы тесты падали.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_BUDGET_MODE
+        if not mode:
+            return self.get_response(request)
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+        match = request.resolver_match
+        problem = match and check_budget(match.view_name, inspector)
+        if problem:
+            if mode == 'raise':
+                raise QueryBudgetExceeded(problem)
+            logger.warning(problem)
+        return response
+
+
+class ReplicaMiddleware:
+    """Направляет чтение лент на реплики, пока пользователь не пишет.
+
+    Если во время запроса в основную базу что-то записали, ответ
+    ставит cookie REPLICA_STICKY_COOKIE: пока она жива, браузер
+    читает из основной базы и видит собственные изменения. Реплики,
+    отставшие от сдвига версий кеша, не читаются (replicas.fresh()).
+    """
+    WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.read_replica = False
+        wrote = []
+
+        def detect_writes(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith(self.WRITES):
+                wrote.append(True)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(detect_writes), \
+                replicas.reading_from_replicas([]):
+            response = self.get_response(request)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name
+                in settings.REPLICA_VIEWS
+                and settings.REPLICA_STICKY_COOKIE not in request.COOKIES):
+            aliases = replicas.fresh()
+            if aliases:
+                request.read_replica = True
+                replicas.use_replicas(aliases)
+
+
+class StaticFilesMiddleware:
+    """Раздаёт STATIC_ROOT со сжатыми копиями (core.staticfiles).
+
+    Стоит первым: запросам к статике не нужны ни кеш страниц, ни сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = staticfiles.serve(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам страницы из core.pagecache; должен стоять первым
+    после раздачи статики."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (pagecache.is_anonymous(request)
+                and not pagecache.is_refresh(request)):
+            response = pagecache.lookup(request)
+            if response is not None:
+                return response
+        return pagecache.store(request, self.get_response(request))
+
+
+class PunchedPageCacheMiddleware:
+    """Отдаёт вошедшим общее тело страницы с личными дырками.
+
+    Должен стоять после AuthenticationMiddleware и CsrfViewMiddleware:
+    дырки рендерятся для request.user и могут выдать CSRF-токен.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, 'punch_holes', False):
+            response = pagecache.store_punched(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not pagecache.is_punchable(request):
+            return None
+        # Условный запрос представление с condition() закроет 304
+        # дешевле, чем соберёт тело из кеша.
+        if not pagecache.is_conditional(request):
+            response = pagecache.lookup_punched(request)
+            if response is not None:
+                return response
+        request.punch_holes = True
+        return None
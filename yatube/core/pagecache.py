@@ -0,0 +1,313 @@
+"""Кеш целых страниц для анонимных читателей.
+
+Представление, которое можно кешировать, вызывает depends_on() с
+областями core.versions, от которых зависит страница. Версии
+запоминаются до рендера и хранятся вместе с ответом: если сигнал
+модели сдвинул версию хотя бы одной области, запись не читается.
+
+AnonymousPageCacheMiddleware стоит первым, поэтому попадание
+не проходит ни сессии, ни шаблоны, ни базу. Запросы с cookie
+сессии в кеш не ходят вовсе, так что вошедший пользователь никогда
+не получит страницу, собранную для анонима. ETag считается по
+содержимому (если представление не поставило его само, например через
+condition()), и повторный визит получает 304 без рендера.
+Last-Modified по датам постов не ставится: правка, удаление поста или
+переименование группы их не меняют, и If-Modified-Since получал бы
+устаревший 304.
+
+Вошедшим пользователям PunchedPageCacheMiddleware отдаёт отдельную
+копию той же страницы, где личные части заменены маркерами
+core.holes: общее тело хранится одно на всех, а дырки заполняются
+для каждого запроса. Если представление строит ETag через
+personal_etag(), общая часть хранится с телом, и копия из кеша
+получает ETag и Last-Modified своего зрителя.
+
+Страница для анонимов свежа SWR_SOFT_TIMEOUT секунд (core.swr). Потом
+запрос получает её сразу, а свежую копию фоновый поток собирает
+внутренним запросом через WSGI-обработчик (render_anonymous); так же
+их прогревает posts.warming. Тело для
+вошедших так пересобрать нельзя — нужен конкретный пользователь, —
+поэтому после мягкого срока оно просто пересобирается в запросе.
+"""
+import hashlib
+import sys
+import time
+from collections import namedtuple
+from io import BytesIO
+from urllib.parse import unquote_to_bytes
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.http import HttpResponse
+from django.urls import resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from . import holes, swr, versions
+
+KEY_PREFIX = 'page:'
+PUNCHED_KEY_PREFIX = 'page:punched:'
+
+# Ключ environ внутреннего запроса, который пересобирает страницу.
+REFRESH_ENVIRON = 'core.pagecache.refresh'
+ENVIRON_KEYS = (
+    'SCRIPT_NAME', 'PATH_INFO', 'QUERY_STRING', 'SERVER_NAME',
+    'SERVER_PORT', 'SERVER_PROTOCOL', 'HTTP_HOST', 'wsgi.url_scheme',
+)
+
+# Заголовки, которые запись кеша хранит отдельно или пересчитывает.
+OWN_HEADERS = {
+    'content-type', 'content-length', 'etag', 'last-modified', 'set-cookie',
+}
+
+_handler = None
+
+Dependencies = namedtuple(
+    'Dependencies', ('scopes', 'versions', 'timeout'))
+
+
+def depends_on(request, *scopes, timeout=None):
+    """Разрешает закешировать ответ на этот запрос для анонимов."""
+    request.page_cache = Dependencies(
+        scopes, versions.get_versions(*scopes) if scopes else {},
+        settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+
+
+def is_refresh(request):
+    return request.META.get(REFRESH_ENVIRON, False)
+
+
+def is_anonymous(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def cache_key(request, prefix=KEY_PREFIX):
+    url = request.build_absolute_uri().encode()
+    return prefix + hashlib.md5(url).hexdigest()
+
+
+def _get_entry(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    scopes = entry['scopes']
+    if scopes and versions.get_versions(*scopes) != entry['versions']:
+        return None
+    return entry
+
+
+def _set_entry(key, request, response, **extra):
+    dependencies = request.page_cache
+    soft_timeout = min(settings.SWR_SOFT_TIMEOUT, dependencies.timeout)
+    cache.set(key, {
+        'scopes': dependencies.scopes,
+        'versions': dependencies.versions,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'fresh_until': time.time() + soft_timeout,
+        **extra,
+    }, dependencies.timeout)
+
+
+def _is_fresh(entry):
+    return time.time() < entry['fresh_until']
+
+
+def base_environ(host, secure=False):
+    """environ внутреннего запроса к сайту на host без исходного запроса."""
+    name, _, port = host.partition(':')
+    return {
+        'SERVER_NAME': name,
+        'SERVER_PORT': port or ('443' if secure else '80'),
+        'HTTP_HOST': host,
+        'wsgi.url_scheme': 'https' if secure else 'http',
+    }
+
+
+def refresh_environ(request, path=None):
+    """environ для внутреннего анонимного запроса к тому же сайту.
+
+    По умолчанию — к той же странице, иначе к path (как из reverse())
+    без параметров.
+    """
+    environ = {
+        key: request.META[key] for key in ENVIRON_KEYS
+        if key in request.META
+    }
+    if path is not None:
+        return with_path(environ, path)
+    environ.setdefault('PATH_INFO', request.path_info)
+    return environ
+
+
+def with_path(environ, path):
+    """Копия environ с другим адресом; path — как из reverse(),
+    можно с параметрами после '?'."""
+    path, _, query = path.partition('?')
+    # PATH_INFO в WSGI — байты пути в latin-1, а не строка URL.
+    return {
+        **environ,
+        'PATH_INFO': unquote_to_bytes(path).decode('iso-8859-1'),
+        'QUERY_STRING': query,
+    }
+
+
+def _request(environ):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        **environ,
+        REFRESH_ENVIRON: True,
+    }
+    return WSGIRequest(environ)
+
+
+def render_anonymous(environ):
+    """Прогоняет environ через весь стек middleware, как настоящий запрос.
+
+    AnonymousPageCacheMiddleware пропускает для него поиск в кеше
+    и сохраняет свежий ответ. Сигналы запроса не посылаются, так что
+    соединения с базой закрывает вызывающий. Возвращает True, если
+    страница теперь лежит в кеше.
+    """
+    global _handler
+    if _handler is None:
+        _handler = WSGIHandler()
+    request = _request(environ)
+    _handler.get_response(request).close()
+    return cache.get(cache_key(request)) is not None
+
+
+def render_for_user(environ, user):
+    """Рендерит страницу от имени user в обход middleware.
+
+    Заполняет общий кеш тела страницы для вошедших и фрагменты внутри
+    неё, в том числе личные (лента подписок). Возвращает True, если
+    тело страницы теперь лежит в кеше.
+    """
+    request = _request(environ)
+    request.user = user
+    request.punch_holes = True
+    request.resolver_match = resolve(request.path_info)
+    view, args, kwargs = request.resolver_match
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    store_punched(request, response)
+    return cache.get(cache_key(request, PUNCHED_KEY_PREFIX)) is not None
+
+
+def _conditional(request, response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response)
+
+
+def lookup(request):
+    """Ответ из кеша, 304 или None, если записи нет или она устарела."""
+    key = cache_key(request)
+    entry = _get_entry(key)
+    if entry is None:
+        return None
+    if not _is_fresh(entry):
+        if not settings.SWR_REFRESH_WORKERS:
+            return None
+        environ = refresh_environ(request)
+        swr.schedule(key, lambda: render_anonymous(environ))
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type'])
+    # Попадание не проходит SecurityMiddleware, сессии и
+    # XFrameOptionsMiddleware: их заголовки берутся из исходного ответа.
+    for header, value in entry.get('headers', ()):
+        response[header] = value
+    patch_vary_headers(response, ('Cookie',))
+    return _conditional(
+        request, response, entry['etag'], entry['last_modified'])
+
+
+def _cacheable(request, response):
+    return (
+        getattr(request, 'page_cache', None) is not None
+        and request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+    )
+
+
+def store(request, response):
+    """Кеширует ответ, если представление разрешило это через depends_on."""
+    if (not is_anonymous(request) or not _cacheable(request, response)
+            or response.cookies or request.user.is_authenticated):
+        return response
+    etag = response.get('ETag') or quote_etag(
+        hashlib.md5(response.content).hexdigest())
+    last_modified = parse_http_date_safe(response.get('Last-Modified'))
+    headers = [(header, value) for header, value in response.items()
+               if header.lower() not in OWN_HEADERS]
+    _set_entry(
+        cache_key(request), request, response,
+        etag=etag, last_modified=last_modified, headers=headers)
+    return _conditional(request, response, etag, last_modified)
+
+
+def is_punchable(request):
+    return request.method in ('GET', 'HEAD') and request.user.is_authenticated
+
+
+def personal_etag(request, shared):
+    """ETag из общей для всех части shared и зрителя страницы.
+
+    Подходит как результат etag_func для condition(): страницы для
+    разных пользователей отличаются дырками, и 304 одного не должен
+    достаться другому.
+    """
+    request.shared_etag = shared
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    return f'{shared}-{viewer}'
+
+
+def is_conditional(request):
+    return ('HTTP_IF_NONE_MATCH' in request.META
+            or 'HTTP_IF_MODIFIED_SINCE' in request.META)
+
+
+def lookup_punched(request):
+    """Общее тело страницы с дырками, заполненными для пользователя."""
+    entry = _get_entry(cache_key(request, PUNCHED_KEY_PREFIX))
+    if entry is None or not _is_fresh(entry):
+        return None
+    response = HttpResponse(content_type=entry['content_type'])
+    response.content = holes.fill(
+        request, entry['content'].decode(response.charset))
+    if entry.get('shared_etag') is not None:
+        response['ETag'] = quote_etag(
+            personal_etag(request, entry['shared_etag']))
+    if entry.get('last_modified') is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def store_punched(request, response):
+    """Кеширует тело с маркерами и заполняет дырки в ответе."""
+    if response.streaming:
+        return response
+    if _cacheable(request, response):
+        _set_entry(
+            cache_key(request, PUNCHED_KEY_PREFIX), request, response,
+            shared_etag=getattr(request, 'shared_etag', None),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified')))
+    response.content = holes.fill(
+        request, response.content.decode(response.charset))
+    return response
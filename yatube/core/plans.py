@@ -0,0 +1,47 @@
+"""Проверка планов запросов через EXPLAIN QUERY PLAN (SQLite).
+
+Полный проход по таблице (SCAN без индекса) и сортировка во
+временном B-дереве на больших таблицах означают, что запросу не
+хватает составного индекса. find_problems прогоняет запросы,
+собранные QueryInspector, и возвращает такие шаги плана.
+"""
+from collections import namedtuple
+
+from django.db import connections
+
+PlanProblem = namedtuple('PlanProblem', ('sql', 'detail'))
+
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def explain(sql, params=None, using='default'):
+    """Шаги плана запроса в виде строк, как их печатает sqlite3."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_problem(detail):
+    if detail.startswith(TEMP_SORT):
+        return True
+    return (
+        detail.startswith('SCAN ')
+        and ' USING ' not in detail
+        and 'VIRTUAL TABLE' not in detail
+        and 'CONSTANT ROW' not in detail
+    )
+
+
+def find_problems(inspector, allowed=(), using='default'):
+    """Плохие шаги планов всех SELECT, записанных inspector.
+
+    allowed — начала строк плана, которые для этой страницы ожидаемы.
+    """
+    problems = []
+    for sql, params in zip(inspector.queries, inspector.params):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        for detail in explain(sql, params, using):
+            if is_problem(detail) and not detail.startswith(tuple(allowed)):
+                problems.append(PlanProblem(sql, detail))
+    return problems
@@ -0,0 +1,113 @@
+"""Поиск N+1 и бюджеты запросов на страницу.
+
+QueryInspector записывает SQL, выполненный внутри блока, и ленивые
+загрузки ForeignKey вместе с шаблоном и строкой, где к полю
+обратились. QueryBudgetMiddleware сверяет число запросов с
+settings.QUERY_BUDGETS по имени URL через check_budget.
+"""
+import sys
+import threading
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor)
+from django.template.base import Node
+
+LazyLoad = namedtuple('LazyLoad', ('field', 'template', 'line'))
+
+_local = threading.local()
+_original_get = ForwardManyToOneDescriptor.__get__
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _template_position():
+    """Ищет в стеке узел шаблона, который сейчас рендерится."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if isinstance(node, Node) and getattr(node, 'token', None):
+            return node.origin.name, node.token.lineno
+        frame = frame.f_back
+    return None, None
+
+
+def _tracking_get(self, instance, cls=None):
+    inspectors = getattr(_local, 'inspectors', None)
+    if (inspectors and instance is not None
+            and not self.field.is_cached(instance)
+            and None not in self.field.get_local_related_value(instance)):
+        template, line = _template_position()
+        lazy_load = LazyLoad(str(self.field), template, line)
+        for inspector in inspectors:
+            inspector.lazy_loads.append(lazy_load)
+    return _original_get(self, instance, cls)
+
+
+def _install():
+    # Дескриптор подменяется только при первом использовании,
+    # чтобы без проверок не платить за лишний вызов на каждом FK.
+    ForwardManyToOneDescriptor.__get__ = _tracking_get
+
+
+class QueryInspector:
+    """Контекстный менеджер, собирающий запросы и ленивые загрузки."""
+
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []
+        self.params = []
+        self.lazy_loads = []
+
+    def __enter__(self):
+        _install()
+        if not hasattr(_local, 'inspectors'):
+            _local.inspectors = []
+        _local.inspectors.append(self)
+        self._wrapper = self.connection.execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        _local.inspectors.remove(self)
+
+    def _record(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        self.params.append(params)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=2):
+        """Запросы одной формы, выполненные threshold и более раз."""
+        return {
+            sql: count for sql, count in Counter(self.queries).items()
+            if count >= threshold
+        }
+
+    def report(self):
+        lines = [f'Запросов: {len(self.queries)}']
+        for sql, count in self.repeated().items():
+            lines.append(f'{count}x {sql}')
+        for lazy_load, count in Counter(self.lazy_loads).items():
+            lines.append(
+                f'{count}x ленивая загрузка {lazy_load.field} '
+                f'в {lazy_load.template}:{lazy_load.line}')
+        return '\n'.join(lines)
+
+
+def check_budget(view_name, inspector):
+    """Возвращает описание нарушения бюджета или None."""
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if budget is None:
+        return None
+    if len(inspector) <= budget and not inspector.lazy_loads:
+        return None
+    return (f'{view_name}: бюджет {budget} запросов нарушен\n'
+            f'{inspector.report()}')
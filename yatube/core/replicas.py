@@ -0,0 +1,106 @@
+"""Чтение лент с реплик, запись — в основную базу.
+
+ReplicaMiddleware включает чтение с реплик только для страниц из
+settings.REPLICA_VIEWS и только для моделей приложений из
+REPLICA_APPS: сессии, пользователи и всё остальное читаются из
+основной базы, чтобы вход на сайт не зависел от отставания реплики.
+
+Тот, кто только что писал, ещё REPLICA_STICKY_SECONDS читает из
+основной базы (см. ReplicaMiddleware), иначе он не увидел бы свой пост.
+
+Страницы, собранные с реплики, попадают в кеши под текущими версиями
+core.versions. Поэтому реплика читается, только если её сняли после
+последнего сдвига версий (fresh()): иначе страница со старыми данными
+легла бы в кеш под новой версией и жила бы там до истечения срока.
+Пока реплики не догнали запись, ленты читаются из основной базы.
+
+Реплики SQLite — копии основного файла, которые sync() снимает через
+backup API и атомарно подменяет; команда sync_replicas делает это
+по расписанию. Копия переводится из WAL в обычный журнал: у неё нет
+файлов -wal и -shm, которые по имени достались бы новому файлу от
+старого, и соединения, открытые до подмены, спокойно дочитывают
+старый файл.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import versions
+
+REPLICA_APPS = {'posts'}
+SYNCED_PREFIX = 'replica:synced:'
+
+_state = threading.local()
+
+
+def use_replicas(aliases=None):
+    """Включает чтение с реплик aliases (по умолчанию — всех) в потоке."""
+    _state.aliases = list(
+        settings.DATABASE_REPLICAS if aliases is None else aliases)
+
+
+@contextmanager
+def reading_from_replicas(aliases=None):
+    """То же на время блока; прежнее состояние потом возвращается."""
+    previous = getattr(_state, 'aliases', [])
+    use_replicas(aliases)
+    try:
+        yield
+    finally:
+        use_replicas(previous)
+
+
+def fresh():
+    """Реплики, снятые после последнего сдвига версий кеша."""
+    aliases = settings.DATABASE_REPLICAS
+    if not aliases:
+        return []
+    synced = cache.get_many([SYNCED_PREFIX + alias for alias in aliases])
+    changed = versions.changed_at()
+    return [alias for alias in aliases
+            if synced.get(SYNCED_PREFIX + alias, 0) >= changed]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = getattr(_state, 'aliases', ())
+        if aliases and model._meta.app_label in REPLICA_APPS:
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них взаимозаменяемы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def sync(alias):
+    """Снимает копию основной базы в файл реплики alias."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    path = connections[alias].settings_dict['NAME']
+    temporary = f'{path}.sync'
+    # Всё, что записано до этого момента, в копию попадёт.
+    started = time.time()
+    target = sqlite3.connect(temporary)
+    try:
+        primary.connection.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    # Открытые соединения дочитывают старый файл, новые видят копию.
+    os.replace(temporary, path)
+    connections[alias].close()
+    cache.set(SYNCED_PREFIX + alias, started, timeout=None)
@@ -0,0 +1,116 @@
+"""Одна пересборка на ключ кеша (single flight).
+
+Когда популярный ключ протухает, все одновременные запросы промахиваются
+разом и считают одно и то же. Здесь пересчёт выполняет только тот,
+кто взял блокировку в бэкенде кеша (lock() из core.cache), а остальные
+опрашивают кеш до SINGLE_FLIGHT_WAIT секунд и берут готовое значение.
+Если держатель блокировки не успел, ждавший считает сам: лучше лишний
+пересчёт, чем зависший запрос. Блокировка живёт не дольше
+SINGLE_FLIGHT_LOCK_TIMEOUT, так что упавший процесс её не удержит.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+from . import versions
+
+LOCK_PREFIX = 'lock:'
+POLL_INTERVAL = 0.02
+
+MISSING = object()
+
+
+def lock(cache, key):
+    """Токен блокировки key в бэкенде кеша или None, если она занята."""
+    if hasattr(cache, 'lock'):
+        return cache.lock(
+            LOCK_PREFIX + key, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+    added = cache.add(
+        LOCK_PREFIX + key, True, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+    return True if added else None
+
+
+def unlock(cache, key, token):
+    if hasattr(cache, 'unlock'):
+        cache.unlock(LOCK_PREFIX + key, token)
+    else:
+        cache.delete(LOCK_PREFIX + key)
+
+
+def run(key, compute, check, cache=None):
+    """Выполняет compute() в одном процессе из всех, кто зовёт run(key).
+
+    Остальные ждут, пока check() не вернёт что-то кроме MISSING, и
+    возвращают это значение.
+    """
+    cache = cache or default_cache
+    token = lock(cache, key)
+    if token is None:
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            result = check()
+            if result is not MISSING:
+                return result
+        return compute()
+    try:
+        # Пока мы брали блокировку, предыдущий держатель мог успеть.
+        result = check()
+        return compute() if result is MISSING else result
+    finally:
+        unlock(cache, key, token)
+
+
+def get_or_set(key, compute, timeout, cache=None):
+    """cache.get_or_set(), где compute() считает только один процесс."""
+    cache = cache or default_cache
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    def fill():
+        value = compute()
+        cache.set(key, value, timeout)
+        return value
+
+    return run(key, fill, lambda: cache.get(key, MISSING), cache)
+
+
+def cache_view(timeout, *scopes):
+    """Кеширует ответ представления, пересобирая его одним процессом.
+
+    Ключ — URL, пользователь и версии областей scopes из core.versions,
+    так что запись сама устаревает при изменении данных.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = ':'.join((
+                request.build_absolute_uri(),
+                str(request.user.pk),
+                *(str(version) for version in
+                  versions.get_versions(*scopes).values()),
+            ))
+            key = 'view:' + hashlib.md5(key.encode()).hexdigest()
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                if hasattr(response, 'render'):
+                    response.render()
+                default_cache.set(key, response, timeout)
+                return response
+
+            response = default_cache.get(key)
+            if response is None:
+                response = run(
+                    key, render, lambda: default_cache.get(key, MISSING))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""Настройка SQLite для работы под нагрузкой.
+
+configure() вешается на connection_created и включает на каждом
+соединении PRAGMA из settings.SQLITE_PRAGMAS: WAL, чтобы читатели
+не ждали писателя, busy_timeout вместо мгновенного «database is
+locked», synchronous=NORMAL, mmap и кеш страниц побольше.
+
+В WAL журнал растёт, пока его не перенесут в базу, поэтому
+MaintenanceThread периодически делает checkpoint, а реже —
+PRAGMA optimize. health() отдаёт размер журнала и базы.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_thread = None
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure(sender, connection, **kwargs):
+    """Приёмник connection_created: включает PRAGMA для SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if connection.alias in settings.DATABASE_REPLICAS:
+        # Реплики только читаются и живут в обычном журнале
+        # (core.replicas.sync), WAL им не включаем.
+        pragmas = {name: value for name, value in pragmas.items()
+                   if name != 'journal_mode'}
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+def wal_path(using='default'):
+    return f"{connections[using].settings_dict['NAME']}-wal"
+
+
+def checkpoint(mode='PASSIVE', using='default'):
+    """Переносит журнал в базу; возвращает (busy, страниц в журнале,
+    перенесено страниц), как PRAGMA wal_checkpoint."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+        return cursor.fetchone()
+
+
+def optimize(using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute('PRAGMA optimize')
+
+
+def health(using='default'):
+    """Состояние базы: режим журнала, размеры файла и журнала в байтах."""
+    with connections[using].cursor() as cursor:
+        report = {}
+        for pragma in ('journal_mode', 'synchronous', 'busy_timeout',
+                       'mmap_size', 'cache_size', 'page_size',
+                       'page_count', 'freelist_count'):
+            cursor.execute(f'PRAGMA {pragma}')
+            row = cursor.fetchone()
+            # Для базы в памяти часть PRAGMA ничего не возвращает.
+            report[pragma] = row[0] if row else None
+    path = wal_path(using)
+    report['database_bytes'] = report['page_size'] * report['page_count']
+    report['wal_bytes'] = os.path.getsize(path) if os.path.exists(path) else 0
+    return report
+
+
+class MaintenanceThread(threading.Thread):
+    """Фоновые checkpoint и optimize для одного процесса.
+
+    PASSIVE-checkpoint не ждёт читателей; если журнал всё равно
+    перерос SQLITE_WAL_LIMIT, делается TRUNCATE, чтобы файл сжался.
+    """
+    def __init__(self, interval, optimize_every, wal_limit,
+                 using='default'):
+        super().__init__(name='sqlite-maintenance', daemon=True)
+        self.interval = interval
+        self.optimize_every = optimize_every
+        self.wal_limit = wal_limit
+        self.using = using
+        self.stopped = threading.Event()
+
+    def run(self):
+        next_optimize = time.monotonic() + self.optimize_every
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    self.tick()
+                    if time.monotonic() >= next_optimize:
+                        optimize(self.using)
+                        next_optimize = time.monotonic() + self.optimize_every
+                except Exception:
+                    logger.exception('Обслуживание SQLite не удалось')
+        finally:
+            connections[self.using].close()
+
+    def tick(self):
+        busy, log, done = checkpoint('PASSIVE', self.using)
+        path = wal_path(self.using)
+        if os.path.exists(path) and os.path.getsize(path) > self.wal_limit:
+            busy, log, done = checkpoint('TRUNCATE', self.using)
+        if busy:
+            logger.warning(
+                'Checkpoint не закончен: перенесено %s из %s страниц',
+                done, log)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_maintenance():
+    """Запускает обслуживание в этом процессе, если оно включено."""
+    global _thread
+    interval = settings.SQLITE_CHECKPOINT_INTERVAL
+    if (interval is None or _thread is not None
+            or connections['default'].vendor != 'sqlite'):
+        return _thread
+    _thread = MaintenanceThread(
+        interval,
+        settings.SQLITE_OPTIMIZE_INTERVAL,
+        settings.SQLITE_WAL_LIMIT,
+    )
+    _thread.start()
+    return _thread
@@ -0,0 +1,149 @@
+"""Статика с хешами в именах и заранее сжатыми копиями.
+
+collectstatic через CompressedManifestStaticFilesStorage кладёт в
+STATIC_ROOT файлы с хешем содержимого в имени, манифест и рядом
+с текстовыми файлами их копии .gz и, если установлен пакет brotli,
+.br. Манифест storage читает один раз при создании, так что
+{% static %} находит хешированное имя в памяти процесса. Файла, которого
+нет ни в манифесте, ни на диске (collectstatic не запускали), тег
+не роняет страницу, а отдаёт его под исходным именем.
+
+serve() раздаёт STATIC_ROOT (см. StaticFilesMiddleware): выбирает по
+Accept-Encoding сжатую копию, хешированным файлам ставит кеширование
+на STATIC_MAX_AGE, остальным — короткое с проверкой Last-Modified.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.svg', '.ico', '.json', '.map', '.txt', '.xml',
+)
+# Кодировки в порядке предпочтения: суффикс файла и значение
+# Content-Encoding.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+UNHASHED_MAX_AGE = 60
+
+
+def compress(path):
+    """Пишет рядом с файлом его сжатые копии, если они меньше."""
+    with open(path, 'rb') as source:
+        data = source.read()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            self.hashed_files[self.hash_key(self.clean_name(name))] = name
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception) and hashed_name:
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # Сжимаем после всех проходов: CSS переписывается несколько раз.
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                compress(self.path(name))
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def find(path):
+    """Путь к файлу в STATIC_ROOT для URL path или None."""
+    if not settings.STATIC_ROOT or not path.startswith(settings.STATIC_URL):
+        return None
+    try:
+        full_path = safe_join(
+            settings.STATIC_ROOT, unquote(path[len(settings.STATIC_URL):]))
+    except SuspiciousFileOperation:
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def serve(request):
+    """Ответ с файлом статики или None, если запрос не к ней."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    full_path = find(request.path)
+    if full_path is None:
+        return None
+    stat = os.stat(full_path)
+    hashed = HASHED_RE.search(full_path) is not None
+    if not hashed and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+    variants = [(coding, full_path + suffix) for coding, suffix in ENCODINGS
+                if os.path.isfile(full_path + suffix)]
+    accepted = accepted_encodings(request)
+    coding, file_path = next(
+        ((coding, variant) for coding, variant in variants
+         if coding in accepted),
+        (None, full_path))
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(open(file_path, 'rb'))
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if coding is not None:
+        response['Content-Encoding'] = coding
+    if variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if hashed:
+        patch_cache_control(
+            response, public=True, max_age=settings.STATIC_MAX_AGE,
+            immutable=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=UNHASHED_MAX_AGE)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
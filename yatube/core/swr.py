@@ -0,0 +1,193 @@
+"""Stale-while-revalidate для фрагментов и страниц.
+
+Запись живёт PAGE_CACHE_TIMEOUT (жёсткий срок), но свежей считается
+только SWR_SOFT_TIMEOUT секунд. Между ними запрос сразу получает старое
+значение, а пересборка уходит в пул из SWR_REFRESH_WORKERS потоков;
+одновременно ключ обновляет только один процесс (блокировка из
+core.singleflight). После жёсткого срока или сдвига версии — обычный
+промах с single flight.
+
+Фоновая задача работает со своим соединением с базой (соединения Django
+привязаны к потоку) и закрывает его по завершении. При
+SWR_REFRESH_WORKERS = 0 пересборка идёт прямо в запросе — так в тестах.
+
+stats — глубина очереди и задержка пересборок этого процесса; их
+показывает core.views.refresh_stats.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import connections
+
+from . import singleflight
+
+logger = logging.getLogger(__name__)
+
+REFRESH_PREFIX = 'refresh:'
+
+Entry = namedtuple('Entry', ('value', 'fresh_until'))
+
+_executor = None
+_local = threading.local()
+
+
+class RefreshStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def enqueue(self):
+        with self.lock:
+            self.queued += 1
+
+    def finish(self, latency, failed=False):
+        with self.lock:
+            self.queued -= 1
+            if failed:
+                self.failed += 1
+                return
+            self.refreshed += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        with self.lock:
+            average = (self.latency_total / self.refreshed
+                       if self.refreshed else 0.0)
+            return {
+                'pid': os.getpid(),
+                'workers': settings.SWR_REFRESH_WORKERS,
+                'queue_depth': self.queued,
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'latency_avg_ms': round(average * 1000, 1),
+                'latency_max_ms': round(self.latency_max * 1000, 1),
+                'latency_last_ms': round(self.latency_last * 1000, 1),
+            }
+
+
+stats = RefreshStats()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.SWR_REFRESH_WORKERS,
+            thread_name_prefix='swr-refresh')
+    return _executor
+
+
+def drain():
+    """Дожидается фоновых пересборок; следующий schedule() создаст пул."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def in_refresh():
+    """Идёт ли в этом потоке фоновая пересборка."""
+    return getattr(_local, 'refreshing', False)
+
+
+def _run(key, refresh):
+    started = time.monotonic()
+    _local.refreshing = True
+    try:
+        refresh()
+    except Exception:
+        logger.exception('Не удалось пересобрать %s', key)
+        stats.finish(time.monotonic() - started, failed=True)
+    else:
+        stats.finish(time.monotonic() - started)
+    finally:
+        _local.refreshing = False
+        connections.close_all()
+
+
+def _refresh(key, refresh, cache, token):
+    try:
+        _run(key, refresh)
+    finally:
+        singleflight.unlock(cache, REFRESH_PREFIX + key, token)
+
+
+def schedule(key, refresh, cache=None):
+    """Ставит refresh() в фоновый пул, если ключ ещё никто не обновляет."""
+    cache = cache or default_cache
+    token = singleflight.lock(cache, REFRESH_PREFIX + key)
+    if token is None:
+        return False
+    stats.enqueue()
+    get_executor().submit(_refresh, key, refresh, cache, token)
+    return True
+
+
+def submit(key, refresh):
+    """Ставит refresh() в фоновый пул без блокировки (прогрев кеша).
+
+    Без потоков (SWR_REFRESH_WORKERS = 0) выполняет его сразу.
+    """
+    if not settings.SWR_REFRESH_WORKERS:
+        refresh()
+        return
+    stats.enqueue()
+    get_executor().submit(_run, key, refresh)
+
+
+def wrap(value, soft_timeout=None):
+    if soft_timeout is None:
+        soft_timeout = settings.SWR_SOFT_TIMEOUT
+    return Entry(value, time.time() + soft_timeout)
+
+
+def is_fresh(entry):
+    return time.time() < entry.fresh_until
+
+
+def get_or_set(key, compute, timeout, detach=None, cache=None):
+    """Как singleflight.get_or_set(), но устаревшее значение отдаётся сразу.
+
+    detach() вызывается в потоке запроса и возвращает функцию, которую
+    безопасно выполнить в другом потоке (например, с копией контекста
+    шаблона); по умолчанию в фоне выполняется сам compute.
+    """
+    cache = cache or default_cache
+
+    def fill(compute=compute):
+        value = compute()
+        cache.set(key, wrap(value), timeout)
+        return value
+
+    entry = cache.get(key)
+    if isinstance(entry, Entry):
+        if is_fresh(entry):
+            return entry.value
+        # Внутри фоновой пересборки (например, страницы целиком)
+        # вложенные устаревшие фрагменты собираются сразу.
+        if not settings.SWR_REFRESH_WORKERS or in_refresh():
+            return fill()
+        background = detach() if detach is not None else compute
+        schedule(key, lambda: fill(background), cache)
+        return entry.value
+
+    def check():
+        entry = cache.get(key)
+        if isinstance(entry, Entry):
+            return entry.value
+        return singleflight.MISSING
+
+    return singleflight.run(key, fill, check, cache)
@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import swr
+
+register = template.Library()
+
+
+class SingleFlightCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.fragment_name, [var.resolve(context) for var in self.vary_on])
+        return swr.get_or_set(
+            key, lambda: self.nodelist.render(context),
+            int(self.timeout.resolve(context)),
+            detach=lambda: self.detach(context))
+
+    def detach(self, context):
+        # Фоновый поток не должен делить стек контекста с запросом.
+        copy = context.new(context.flatten())
+        return lambda: self.nodelist.render(copy)
+
+
+@register.tag('single_flight_cache')
+def do_single_flight_cache(parser, token):
+    """{% cache %}, фрагмент которого пересобирает один процесс.
+
+    timeout — жёсткий срок; после SWR_SOFT_TIMEOUT фрагмент отдаётся
+    как есть и пересобирается в фоне (core.swr).
+
+    {% single_flight_cache timeout name [vary_on ...] %}
+    ...
+    {% endsingle_flight_cache %}
+    """
+    nodelist = parser.parse(('endsingle_flight_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    return SingleFlightCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
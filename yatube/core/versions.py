@@ -0,0 +1,71 @@
+"""Версии областей кеша.
+
+Ключи кешированных фрагментов включают версию области (например,
+ленты группы). Сигналы моделей увеличивают версию, и старые ключи
+просто перестают читаться, поэтому TTL фрагментов можно делать долгим.
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'version:'
+# Время последнего bump(); по нему core.replicas судит об отставании.
+CHANGED_KEY = 'versions:changed'
+
+
+def _key(scope):
+    return KEY_PREFIX + scope
+
+
+def _seed(key):
+    # Версия стартует со времени, а не с единицы: если ключ вытеснят
+    # из кеша, новая версия не совпадёт ни с одной из прежних.
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def get_version(scope):
+    key = _key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = _seed(key)
+    return version
+
+
+def get_versions(*scopes):
+    """Возвращает {область: версия} за один запрос к кешу."""
+    keys = {_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    return {
+        scope: found[key] if key in found else _seed(key)
+        for key, scope in keys.items()
+    }
+
+
+def changed_at():
+    """Время последнего bump() (time.time())."""
+    changed = cache.get(CHANGED_KEY)
+    if changed is None:
+        # Ключ вытеснили: момент сдвига неизвестен, считаем, что сейчас.
+        cache.add(CHANGED_KEY, time.time(), timeout=None)
+        changed = cache.get(CHANGED_KEY)
+    return changed
+
+
+def bump(*scopes):
+    """Инвалидирует всё, что закешировано под версиями этих областей."""
+    keys = {_key(scope) for scope in scopes}
+    # Время пишется до сдвига: incr рассылает поколение, и процессы,
+    # сбросившие L1, прочтут уже новое.
+    cache.set(CHANGED_KEY, time.time(), timeout=None)
+    if hasattr(cache, 'incr_many'):
+        # Один UPDATE и одна рассылка поколения на все области, сколько
+        # бы подписчиков ни было у автора. Пропавший ключ не засеваем:
+        # get_version() засеет его новым временем при чтении.
+        cache.incr_many(keys)
+        return
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            _seed(key)
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import swr
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -17,3 +21,9 @@ def server_error(request):
 def permission_denied(request, exception):
     return render(request, 'core/403.html',
                   status=403)
+
+
+@staff_member_required
+def refresh_stats(request):
+    """Очередь и задержка фоновых пересборок кеша в этом процессе."""
+    return JsonResponse(swr.stats.snapshot())
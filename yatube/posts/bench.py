@@ -0,0 +1,40 @@
+"""Наполнение временной БД для команд-бенчмарков."""
+from django.db import connection
+
+from . import bodies
+from .models import Group, Post, User
+
+BATCH_SIZE = 5000
+
+
+def seed_posts(count, authors=10, groups=5, text='Тестовый пост'):
+    """Создаёт count постов с разными датами публикации.
+
+    Даты разносятся на секунду по id, чтобы порядок ленты был
+    таким же, как у реальных данных.
+    """
+    User.objects.bulk_create(
+        User(username=f'bench_author_{i}') for i in range(authors))
+    users = list(User.objects.filter(username__startswith='bench_author_'))
+    Group.objects.bulk_create(
+        Group(slug=f'bench-group-{i}', title=f'Группа {i}',
+              description='Группа для замеров')
+        for i in range(groups))
+    group_list = list(Group.objects.filter(slug__startswith='bench-group-'))
+    for start in range(0, count, BATCH_SIZE):
+        Post.objects.bulk_create(
+            Post(
+                author=users[i % len(users)],
+                group=group_list[i % len(group_list)],
+                text=f'{text} №{i}',
+                text_html=bodies.render_html(f'{text} №{i}'),
+                excerpt=bodies.render_excerpt(f'{text} №{i}'),
+            )
+            for i in range(start, min(start + BATCH_SIZE, count))
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE posts_post "
+            "SET pub_date = datetime('2020-01-01', '+' || id || ' seconds')"
+        )
+    return users, group_list
@@ -0,0 +1,63 @@
+"""Заранее отрендеренный текст поста.
+
+Post.save() кладёт в text_html экранированный текст с <br> вместо
+переводов строк, а в excerpt — так же отрендеренное начало текста
+для карточек лент. Шаблоны выводят их как есть и не экранируют текст
+на каждом показе. Посты, сохранённые в обход save() (bulk_create,
+update()), дорендеривает команда render_post_bodies; до этого шаблоны
+выводят text по-старому. Чтобы update() текста не оставил устаревший
+HTML, триггер TRIGGERS очищает его; как и триггеры поиска, его нужно
+создавать заново после миграций, пересоздающих posts_post.
+"""
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 300
+BATCH_SIZE = 500
+
+TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS posts_post_stale_html "
+    "AFTER UPDATE OF text ON posts_post "
+    "WHEN new.text IS NOT old.text AND new.text_html IS old.text_html "
+    "BEGIN "
+    "UPDATE posts_post SET text_html = '', excerpt = '' WHERE id = new.id; "
+    "END",
+)
+DROP = ('DROP TRIGGER IF EXISTS posts_post_stale_html',)
+
+
+def render_html(text):
+    return str(linebreaksbr(text, autoescape=True))
+
+
+def render_excerpt(text):
+    return render_html(Truncator(text).chars(EXCERPT_LENGTH))
+
+
+def has_more(text):
+    """Не поместился ли текст в excerpt."""
+    return len(text) > EXCERPT_LENGTH
+
+
+def backfill(queryset, batch_size=BATCH_SIZE):
+    """Пересчитывает text_html и excerpt постов queryset.
+
+    Изменённые посты записываются пачками по batch_size, так что
+    память не растёт с размером таблицы. Возвращает число постов,
+    у которых они изменились.
+    """
+    manager = queryset.model.objects
+    changed, total = [], 0
+    for post in queryset.only('text', 'text_html', 'excerpt').iterator(
+            chunk_size=batch_size):
+        html, excerpt = render_html(post.text), render_excerpt(post.text)
+        if (post.text_html, post.excerpt) != (html, excerpt):
+            post.text_html, post.excerpt = html, excerpt
+            changed.append(post)
+        if len(changed) >= batch_size:
+            manager.bulk_update(changed, ('text_html', 'excerpt'))
+            total += len(changed)
+            changed = []
+    if changed:
+        manager.bulk_update(changed, ('text_html', 'excerpt'))
+    return total + len(changed)
@@ -0,0 +1,130 @@
+"""Счётчики постов и комментариев.
+
+Счётчик, которого ещё нет в таблице, считается по исходным данным
+при первой записи или первом чтении. Сигналы двигают счётчики,
+а reconcile() чинит накопившийся дрейф. Пересчёт отсутствующего
+счётчика делает один процесс (core.singleflight), остальные ждут
+готовую строку.
+"""
+from django.db.models import Count, F
+
+from core import singleflight
+from .models import Comment, Counter, Group, Post
+
+TOTAL_POSTS = 'posts'
+
+
+def author_posts_key(author_id):
+    return f'posts:author:{author_id}'
+
+
+def group_posts_key(group_id):
+    return f'posts:group:{group_id}'
+
+
+def post_comments_key(post_id):
+    return f'comments:post:{post_id}'
+
+
+SOURCES = {
+    'posts:author': lambda pk: Post.objects.filter(author_id=pk),
+    'posts:group': lambda pk: Post.objects.filter(group_id=pk),
+    'comments:post': lambda pk: Comment.objects.filter(post_id=pk),
+}
+
+
+def _source(key):
+    """Queryset, по которому считается значение счётчика."""
+    if key == TOTAL_POSTS:
+        return Post.objects.all()
+    prefix, pk = key.rsplit(':', 1)
+    return SOURCES[prefix](int(pk))
+
+
+def _stored(key):
+    value = Counter.objects.filter(key=key).values_list(
+        'value', flat=True).first()
+    return singleflight.MISSING if value is None else value
+
+
+def _create(key):
+    def count():
+        counter, _ = Counter.objects.get_or_create(
+            key=key, defaults={'value': _source(key).count()})
+        return counter.value
+
+    return singleflight.run(f'counter:{key}', count, lambda: _stored(key))
+
+
+def _get(key):
+    value = _stored(key)
+    if value is singleflight.MISSING:
+        value = _create(key)
+    return value
+
+
+def posts_count():
+    return _get(TOTAL_POSTS)
+
+
+def author_posts_count(author_id):
+    return _get(author_posts_key(author_id))
+
+
+def group_posts_count(group_id):
+    return _get(group_posts_key(group_id))
+
+
+def comments_count(post_id):
+    return _get(post_comments_key(post_id))
+
+
+def change(*keys, delta=1):
+    """Сдвигает счётчики на delta; отсутствующие считает заново.
+
+    Вызывается после записи, поэтому свежий подсчёт уже её учитывает.
+    """
+    Counter.objects.filter(key__in=keys).update(value=F('value') + delta)
+    existing = set(Counter.objects.filter(
+        key__in=keys).values_list('key', flat=True))
+    for key in set(keys) - existing:
+        _create(key)
+
+
+def forget(*keys):
+    Counter.objects.filter(key__in=keys).delete()
+
+
+def expected_counts():
+    """Считает все счётчики заново по исходным таблицам."""
+    counts = {TOTAL_POSTS: Post.objects.count()}
+    # order_by() снимает сортировку модели: иначе Django 2.2 добавит
+    # pub_date в GROUP BY и каждая группа будет из одной строки.
+    by_author = Post.objects.order_by().values('author_id').annotate(
+        total=Count('pk'))
+    for row in by_author:
+        counts[author_posts_key(row['author_id'])] = row['total']
+    by_group = Group.objects.annotate(total=Count('posts'))
+    for group in by_group:
+        counts[group_posts_key(group.pk)] = group.total
+    by_post = Comment.objects.order_by().values('post_id').annotate(
+        total=Count('pk'))
+    for row in by_post:
+        counts[post_comments_key(row['post_id'])] = row['total']
+    return counts
+
+
+def reconcile():
+    """Исправляет расхождения счётчиков и возвращает {ключ: (было, стало)}.
+
+    Счётчики, для которых исходных строк больше нет, обнуляются.
+    """
+    expected = expected_counts()
+    fixed = {}
+    for counter in Counter.objects.all():
+        value = expected.pop(counter.key, 0)
+        if counter.value != value:
+            fixed[counter.key] = (counter.value, value)
+            counter.value = value
+            counter.save(update_fields=('value',))
+    return fixed
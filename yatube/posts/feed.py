@@ -0,0 +1,101 @@
+"""Материализованная лента подписок.
+
+Запись в ленту читателя создаётся в момент публикации поста
+(fan-out on write), поэтому `follow_index` читает готовый,
+отсортированный по индексу срез вместо join-а Post и Follow.
+Первые страницы ленты кешируются под версией scopes.feed(user_id);
+её сдвигают функции ниже и сигналы постов (signals._post_scopes).
+"""
+from django.db import transaction
+
+from core import versions
+from . import scopes
+from .models import FeedItem, Follow, Post
+
+# Явный batch_size bulk_create не урезается под лимит SQLite: больше
+# 500 строк в одном INSERT ... SELECT она не принимает.
+BATCH_SIZE = 500
+FEED_KEYS = ('pub_date', 'post_id')
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _fill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date')
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту читателя постами автора после подписки."""
+    _fill(user_id, author_id)
+    versions.bump(scopes.feed(user_id))
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+    versions.bump(scopes.feed(user_id))
+
+
+def followers(author_ids):
+    """id читателей, в ленты которых попадают посты этих авторов."""
+    return Follow.objects.filter(
+        author_id__in=author_ids).values_list('user_id', flat=True)
+
+
+def rebuild():
+    """Пересобирает ленты всех читателей с нуля.
+
+    Удаление и заполнение идут в одной транзакции: читатели до конца
+    видят старые ленты, а не пустые. Версии лент сдвигаются после
+    коммита, чтобы в кеш не попали страницы старых лент под новыми
+    версиями.
+    """
+    with transaction.atomic():
+        readers = set(
+            FeedItem.objects.values_list('user_id', flat=True).distinct())
+        FeedItem.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            _fill(user_id, author_id)
+            readers.add(user_id)
+        transaction.on_commit(lambda: versions.bump(
+            *(scopes.feed(user_id) for user_id in readers)))
+
+
+def find_drift():
+    """Сверяет ленты с прямым запросом через join Post и Follow.
+
+    Возвращает словарь {user_id: (недостающие id, лишние id)}
+    только для читателей с расхождениями.
+    """
+    drift = {}
+    readers = set(Follow.objects.values_list('user_id', flat=True))
+    readers.update(FeedItem.objects.values_list('user_id', flat=True))
+    for user_id in readers:
+        expected = set(Post.objects.filter(
+            author__following__user_id=user_id
+        ).values_list('id', flat=True))
+        actual = set(FeedItem.objects.filter(
+            user_id=user_id
+        ).values_list('post_id', flat=True))
+        if expected != actual:
+            drift[user_id] = (expected - actual, actual - expected)
+    return drift
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from . import images
 from .models import Post, Comment
 
 
@@ -18,6 +20,19 @@ class PostForm(forms.ModelForm):
             'group': _('The group can be omitted')
         }
 
+    def clean_image(self):
+        """Поворачивает по EXIF, чистит метаданные и ужимает картинку."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data:
+            images.build_variants(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
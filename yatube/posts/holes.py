@@ -0,0 +1,21 @@
+"""Личные фрагменты страниц постов для core.holes."""
+from core.holes import hole
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, username):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=username).exists()
+    return {'following': following}
+
+
+@hole('edit_link', 'posts/includes/edit_link.html')
+def edit_link(request, post_id, author_id):
+    return {'post_id': int(post_id), 'author_id': int(author_id)}
+
+
+@hole('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': int(post_id), 'form': CommentForm()}
@@ -0,0 +1,82 @@
+"""Обработка картинок постов при загрузке.
+
+Оригинал поворачивается по EXIF, теряет метаданные, уменьшается до
+POST_IMAGE_MAX_SIZE и пересохраняется в JPEG. Затем для каждой ширины
+из POST_IMAGE_WIDTHS сохраняются варианты в WebP и JPEG.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import PostImageVariant
+
+JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': True}
+WEBP_OPTIONS = {'quality': 80, 'method': 4}
+SAVE_OPTIONS = {
+    PostImageVariant.JPEG: ('JPEG', JPEG_OPTIONS),
+    PostImageVariant.WEBP: ('WEBP', WEBP_OPTIONS),
+}
+
+
+def _to_rgb(image):
+    """Снимает прозрачность, подкладывая белый фон."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, image_format):
+    pil_format, options = SAVE_OPTIONS[image_format]
+    buffer = BytesIO()
+    # exif не передаётся, поэтому метаданные в файл не попадают.
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def normalize(uploaded):
+    """Возвращает очищенную и уменьшенную копию загруженной картинки."""
+    uploaded.seek(0)
+    with Image.open(uploaded) as image:
+        image = _to_rgb(ImageOps.exif_transpose(image))
+    image.thumbnail(settings.POST_IMAGE_MAX_SIZE, Image.LANCZOS)
+    stem = os.path.splitext(os.path.basename(uploaded.name))[0]
+    return ContentFile(
+        _encode(image, PostImageVariant.JPEG), name=f'{stem}.jpg')
+
+
+def build_variants(post):
+    """Пересоздаёт варианты картинки поста под все ширины и форматы."""
+    for variant in post.image_variants.all():
+        variant.image.delete(save=False)
+    post.image_variants.all().delete()
+    if not post.image:
+        return []
+    post.image.open()
+    with Image.open(post.image) as image:
+        image = _to_rgb(image)
+    post.image.close()
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    widths = [width for width in settings.POST_IMAGE_WIDTHS
+              if width < image.width] + [image.width]
+    variants = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for image_format in (PostImageVariant.WEBP, PostImageVariant.JPEG):
+            variant = PostImageVariant(
+                post=post, format=image_format, width=width, height=height)
+            extension = 'jpg' if image_format == PostImageVariant.JPEG \
+                else image_format
+            variant.image.save(
+                f'{stem}-{width}w.{extension}',
+                ContentFile(_encode(resized, image_format)),
+                save=False,
+            )
+            variants.append(variant)
+    return PostImageVariant.objects.bulk_create(variants)
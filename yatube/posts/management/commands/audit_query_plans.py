@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.bench import scratch_database
+from core.plans import find_problems
+from core.queries import QueryInspector
+from posts import feed
+from posts.bench import seed_posts
+from posts.models import Comment, Follow, Post
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет запросы страниц с бюджетом через EXPLAIN QUERY PLAN '
+            'на большой временной БД и ищет полные проходы и сортировки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            urls, reader = self.seed(options['posts'])
+            failed = self.audit(urls, reader)
+        if failed:
+            raise CommandError(f'Планы без индекса у страниц: {failed}.')
+        self.stdout.write(self.style.SUCCESS('Все запросы идут по индексам.'))
+
+    def seed(self, count):
+        authors, groups = seed_posts(count)
+        reader = authors[-1]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in authors[:-1])
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=reader, text=f'Комментарий {i}')
+            for i in range(100))
+        feed.rebuild()
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[groups[0].slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[authors[0].username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[post.pk]),
+            'posts:comments': reverse('posts:comments', args=[post.pk]),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:search': reverse('posts:search') + '?q=пост',
+        }
+        missing = set(settings.QUERY_BUDGETS) - set(urls)
+        if missing:
+            raise CommandError(
+                f'Нет адреса для проверки страниц: {sorted(missing)}.')
+        return urls, reader
+
+    def audit(self, urls, reader):
+        client = Client()
+        client.force_login(reader)
+        failed = []
+        for name, url in urls.items():
+            for params in ('', 'page=2', 'after='):
+                separator = '&' if '?' in url else '?'
+                full_url = f'{url}{separator}{params}' if params else url
+                cache.clear()
+                with QueryInspector() as inspector:
+                    client.get(full_url)
+                problems = find_problems(
+                    inspector, settings.QUERY_PLAN_ALLOWED.get(name, ()))
+                for problem in problems:
+                    self.stderr.write(
+                        f'{full_url}: {problem.detail}\n    {problem.sql}')
+                if problems and name not in failed:
+                    failed.append(name)
+            status = 'ошибки' if name in failed else 'ok'
+            self.stdout.write(f'{name}: {status}')
+        return failed
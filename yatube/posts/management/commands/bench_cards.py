@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+
+from core.bench import measure, scratch_database
+from posts import thumbnails
+from posts.bench import seed_posts
+from posts.models import Post
+from posts.templatetags.post_cards import CARD_TEMPLATE, card_key
+
+PLAIN = Template(
+    '{% for post in page_obj %}'
+    f'{{% include "{CARD_TEMPLATE}" %}}'
+    '{% if not forloop.last %}<hr>{% endif %}'
+    '{% endfor %}')
+CARDS = Template("{% include 'posts/includes/posts.html' %}")
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендер ленты без кеша карточек, с пустым и '
+            'с заполненным кешем при разном числе постов на странице.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_posts(max(options['sizes']))
+            for size in options['sizes']:
+                self.report(size, options['repeat'])
+
+    def report(self, size, repeat):
+        posts = thumbnails.attach(
+            Post.objects.select_related('author', 'group').prefetch_related(
+                'image_variants')[:size],
+            thumbnails.FEED)
+        context = Context({'page_obj': posts, 'geometry': thumbnails.FEED})
+        keys = [card_key(post, thumbnails.FEED) for post in posts]
+
+        def cold():
+            cache.delete_many(keys)
+            CARDS.render(context)
+
+        plain = measure(lambda: PLAIN.render(context), repeat)
+        empty = measure(cold, repeat)
+        CARDS.render(context)
+        warm = measure(lambda: CARDS.render(context), repeat)
+        cache.delete_many(keys)
+        self.stdout.write(
+            f'{size:>4} постов: без кеша {plain:8.2f} ms, '
+            f'пустой кеш {empty:8.2f} ms, тёплый кеш {warm:8.2f} ms')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from core.bench import measure, scratch_database
+from posts.bench import seed_posts
+from posts.models import Post
+from posts.utils import get_page_context
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку первой и глубокой страницы '
+            'для ?page=N и курсорной пагинации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_010)
+        parser.add_argument('--page', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_posts(options['posts'])
+            self.report(options['page'], options['repeat'])
+
+    def report(self, deep_page, repeat):
+        factory = RequestFactory()
+        posts = Post.objects.select_related('author', 'group')
+        per_page = get_page_context(
+            posts, factory.get('/'))['paginator'].per_page
+        deep_row = posts[(deep_page - 1) * per_page - 1]
+        token = get_page_context(
+            posts, factory.get('/', {'after': ''})
+        )['paginator'].encode(deep_row)
+        cases = (
+            ('page', 1, {'page': 1}),
+            ('page', deep_page, {'page': deep_page}),
+            ('cursor', 1, {'after': ''}),
+            ('cursor', deep_page, {'after': token}),
+        )
+        for mode, number, params in cases:
+            request = factory.get('/', params)
+
+            def render_page():
+                page_obj = get_page_context(posts, request)['page_obj']
+                list(page_obj)
+                page_obj.has_other_pages()
+
+            elapsed = measure(render_page, repeat)
+            self.stdout.write(f'{mode:>6} page {number:>6}: {elapsed:8.2f} ms')
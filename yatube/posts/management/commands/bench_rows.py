@@ -0,0 +1,55 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.bench import measure, scratch_database
+from posts import rows, thumbnails
+from posts.bench import seed_posts
+from posts.models import Post
+
+
+def models_page(size):
+    posts = Post.objects.select_related(
+        'author', 'group').prefetch_related('image_variants')[:size]
+    return thumbnails.attach(posts, thumbnails.FEED)
+
+
+def rows_page(size):
+    values = rows.post_values(Post.objects.all())[:size]
+    return thumbnails.attach(rows.build(values), thumbnails.FEED)
+
+
+def retained(build, size):
+    """Сколько байт занимает в памяти готовая страница."""
+    tracemalloc.start()
+    page = build(size)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del page
+    return current
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает страницу ленты из моделей и из лёгких строк '
+            'posts.rows: время сборки и память на страницу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_posts(max(options['sizes']))
+            for size in options['sizes']:
+                self.report(size, options['repeat'])
+
+    def report(self, size, repeat):
+        model_time = measure(lambda: models_page(size), repeat)
+        row_time = measure(lambda: rows_page(size), repeat)
+        model_memory = retained(models_page, size) / 1024
+        row_memory = retained(rows_page, size) / 1024
+        self.stdout.write(
+            f'{size:>4} постов: модели {model_time:7.2f} ms '
+            f'{model_memory:8.1f} KiB, строки {row_time:7.2f} ms '
+            f'{row_memory:8.1f} KiB')
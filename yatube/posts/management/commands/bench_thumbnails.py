@@ -0,0 +1,66 @@
+import tempfile
+from functools import partial
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from PIL import Image
+
+from core.bench import measure, scratch_database
+from posts import thumbnails
+from posts.bench import seed_posts
+from posts.models import Post
+from posts.utils import get_page_context
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендер ленты главной страницы с поштучным и '
+            'постраничным поиском миниатюр на холодном и тёплом кеше.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                scratch_database():
+            seed_posts(options['posts'])
+            self.add_images()
+            self.report(options['repeat'])
+
+    def add_images(self):
+        for post in Post.objects.all():
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 800), 'gray').save(buffer, 'JPEG')
+            post.image = default_storage.save(
+                f'posts/bench_{post.pk}.jpg', ContentFile(buffer.getvalue()))
+            post.save(update_fields=['image'])
+            thumbnails.generate(post.image.name)
+
+    def report(self, repeat):
+        request = RequestFactory().get('/')
+        posts = Post.objects.select_related(
+            'author', 'group').prefetch_related('image_variants')
+        modes = (
+            ('per-post', None),
+            ('batched', partial(thumbnails.attach, geometry=thumbnails.FEED)),
+        )
+        for mode, transform in modes:
+            def render_page():
+                context = get_page_context(posts, request, transform)
+                render_to_string('posts/includes/posts.html', context)
+
+            def render_cold():
+                cache.clear()
+                render_page()
+
+            cold = measure(render_cold, repeat)
+            render_page()
+            warm = measure(render_page, repeat)
+            self.stdout.write(
+                f'{mode:>8}: cold {cold:8.2f} ms, warm {warm:8.2f} ms')
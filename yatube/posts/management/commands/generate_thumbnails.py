@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Нарезает в пуле процессов миниатюры для картинок постов '
+            'без вариантов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов пула.',
+        )
+
+    def handle(self, *args, **options):
+        # Посты с вариантами картинки миниатюры sorl не показывают.
+        names = list(Post.objects.exclude(image='').filter(
+            image_variants__isnull=True).values_list(
+            'image', flat=True).distinct())
+        connections.close_all()
+        start = time.perf_counter()
+        failed = 0
+        with thumbnails.get_executor(options['workers']) as executor:
+            futures = [executor.submit(thumbnails.generate, name)
+                       for name in names]
+            for name, future in zip(names, futures):
+                if future.exception() is not None:
+                    failed += 1
+                    self.stderr.write(f'{name}: {future.exception()}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, ошибок: {failed}, '
+            f'{elapsed:.1f} с'))
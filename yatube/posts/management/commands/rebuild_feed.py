@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок и сверяет их с join-запросом.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить ленты, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            feed.rebuild()
+            self.stdout.write('Ленты подписок пересобраны.')
+        drift = feed.find_drift()
+        for user_id, (missing, extra) in drift.items():
+            self.stderr.write(
+                f'Пользователь {user_id}: не хватает {len(missing)}, '
+                f'лишних {len(extra)}'
+            )
+        if drift:
+            raise CommandError(
+                f'Лента расходится с подписками у {len(drift)} читателей.')
+        self.stdout.write(self.style.SUCCESS('Ленты совпадают с подписками.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и сверяет его.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить индекс, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='После пересборки слить сегменты индекса.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            search.rebuild()
+            self.stdout.write('Поисковый индекс пересобран.')
+            if options['optimize']:
+                search.optimize()
+                self.stdout.write('Сегменты индекса слиты.')
+        try:
+            search.check()
+        except DatabaseError as error:
+            raise CommandError(f'Индекс расходится с постами: {error}')
+        self.stdout.write(self.style.SUCCESS('Индекс совпадает с постами.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и комментариев и чинит дрейф.'
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile()
+        for key, (old, new) in sorted(fixed.items()):
+            self.stdout.write(f'{key}: {old} -> {new}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {len(fixed)}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import bodies
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает HTML текста и начало текста постов, '
+            'сохранённых в обход Post.save().')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=bodies.BATCH_SIZE,
+            help='Сколько постов обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        changed = bodies.backfill(
+            Post.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {changed}'))
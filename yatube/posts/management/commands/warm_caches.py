@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import pagecache
+from posts import warming
+
+
+def default_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS
+             if not host.startswith(('.', '*'))]
+    return hosts[0] if hosts else 'localhost'
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кеш главной и самых наполненных групп и профилей '
+            'перед тем, как воркер начнёт принимать запросы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--groups', type=int, default=10,
+            help='Сколько групп прогреть, по убыванию числа постов.')
+        parser.add_argument(
+            '--profiles', type=int, default=10,
+            help='Сколько профилей прогреть, по убыванию числа постов.')
+        parser.add_argument(
+            '--index-pages', type=int, default=3,
+            help='Сколько первых страниц главной прогреть.')
+        parser.add_argument(
+            '--host', default=default_host(),
+            help='Хост из запросов читателей: он входит в ключ кеша.')
+        parser.add_argument(
+            '--https', action='store_true',
+            help='Читатели приходят по HTTPS.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        paths = warming.top_pages(
+            options['groups'], options['profiles'], options['index_pages'])
+        environ = pagecache.base_environ(options['host'], options['https'])
+        warmed = warming.warm(environ, paths)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето ключей: {warmed} из {len(paths)} страниц '
+            f'за {time.monotonic() - started:.2f} с.'))
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from posts import search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_postimagevariant'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            (search.CREATE_TABLE, *search.TRIGGERS, search.REBUILD),
+            search.DROP,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+from posts import bodies, search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_composite_indexes'),
+    ]
+
+    # SQLite пересоздаёт posts_post вместе с её триггерами в обе стороны.
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, search.TRIGGERS),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Начало текста в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunSQL(search.TRIGGERS, migrations.RunSQL.noop),
+        migrations.RunSQL(bodies.TRIGGERS, bodies.DROP),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+from posts import bodies, search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_bodies'),
+    ]
+
+    # SQLite пересоздаёт posts_post вместе с её триггерами в обе стороны.
+    operations = [
+        migrations.RunSQL(
+            migrations.RunSQL.noop, (*search.TRIGGERS, *bodies.TRIGGERS)),
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            'UPDATE posts_post SET updated = pub_date',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            (*search.TRIGGERS, *bodies.TRIGGERS), migrations.RunSQL.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from . import bodies
 
 User = get_user_model()
 
@@ -43,15 +46,54 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    text_html = models.TextField(
+        'Текст в HTML', blank=True, editable=False)
+    excerpt = models.TextField(
+        'Начало текста в HTML', blank=True, editable=False)
+    # Меняются при правке поста и новых комментариях; из них
+    # post_detail строит ETag и Last-Modified.
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'post'
         verbose_name_plural = 'posts'
+        # Ленты сортируются по (-pub_date, -id), в том числе внутри
+        # автора и группы; индексы покрывают и фильтр, и сортировку.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, update_fields=None, **kwargs):
+        self.text_html = bodies.render_html(self.text)
+        self.excerpt = bodies.render_excerpt(self.text)
+        if update_fields is not None and 'text' in update_fields:
+            update_fields = {*update_fields, 'text_html', 'excerpt'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    @property
+    def has_more(self):
+        return bodies.has_more(self.text)
+
+    @classmethod
+    def touch(cls, pk):
+        """Сдвигает версию и дату изменения поста без его сохранения."""
+        cls.objects.filter(pk=pk).update(
+            version=models.F('version') + 1, updated=timezone.now())
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -78,6 +120,10 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(
+            fields=['post', '-created', '-id'],
+            name='comment_post_created_idx'
+        )]
 
 
 class Follow(models.Model):
@@ -99,8 +145,87 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follow'
         )]
+        # Обратный порядок для рассылки поста подписчикам автора.
+        indexes = [models.Index(
+            fields=['author', 'user'],
+            name='follow_author_user_idx'
+        )]
 
     def __str__(self):
         return (f'Пользователь {self.user} '
                 f'подписан на пользователя {self.author}'
                 )
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан читатель."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_feed_item'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='feed_user_pub_date_idx'
+        )]
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик, чтобы не считать COUNT(*) на каждый запрос.
+
+    Ключи строятся функциями из posts.counters.
+    """
+    key = models.CharField('Ключ', max_length=100, unique=True)
+    value = models.IntegerField('Значение', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик'
+        verbose_name_plural = 'Счётчики'
+
+    def __str__(self):
+        return f'{self.key} = {self.value}'
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста в одном из форматов.
+
+    Размеры хранятся в базе, чтобы строить srcset без обращения к диску.
+    """
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMAT_CHOICES = (
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост',
+    )
+    format = models.CharField('Формат', max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    image = models.ImageField('Картинка', upload_to='posts/variants/')
+
+    class Meta:
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
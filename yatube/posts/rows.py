@@ -0,0 +1,152 @@
+"""Лёгкие строки постов для страниц лент.
+
+Лентам не нужны модели Post, User и Group целиком (с хешем пароля
+автора и прочими полями, которых карточка не показывает). values_list
+берёт только колонки карточки (posts/includes/post_card.html), а
+build() раскладывает их по объектам со __slots__ с теми же именами
+атрибутов: post.author.username, post.group.slug, post.image.
+Картинка — настоящий ImageFieldFile, поэтому тег post_image,
+thumbnails.attach и post_cards работают со строками так же, как
+с моделями. Сравнение строки с моделью идёт по pk.
+"""
+from django.db.models import F
+
+from . import bodies
+from .models import Group, Post, PostImageVariant, User
+
+IMAGE_FIELD = Post._meta.get_field('image')
+
+POST_COLUMNS = (
+    'id', 'text', 'excerpt', 'pub_date', 'image', 'author_id', 'group_id')
+JOINED = {
+    'author_username': 'author__username',
+    'group_slug': 'group__slug',
+    'group_title': 'group__title',
+}
+# Записи ленты подписок: id поста — post_id, дата своя у записи.
+FEED_COLUMNS = {
+    'text': 'post__text',
+    'excerpt': 'post__excerpt',
+    'image': 'post__image',
+    'author_id': 'post__author',
+    'group_id': 'post__group',
+    'author_username': 'post__author__username',
+    'group_slug': 'post__group__slug',
+    'group_title': 'post__group__title',
+}
+
+
+class Row:
+    """Строка, равная экземпляру model с тем же pk."""
+    __slots__ = ()
+    model = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, (type(self), self.model)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.pk}>'
+
+
+class AuthorRow(Row):
+    __slots__ = ('id', 'username')
+    model = User
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow(Row):
+    __slots__ = ('id', 'slug', 'title')
+    model = Group
+
+    def __init__(self, id, slug, title):
+        self.id = id
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class Variants(tuple):
+    """Варианты картинки с интерфейсом prefetch: post.image_variants.all()."""
+    def all(self):
+        return self
+
+
+class PostRow(Row):
+    __slots__ = (
+        'id', 'text', 'excerpt', 'pub_date', 'image', 'author_id',
+        'group_id', 'author', 'group', 'image_variants',
+        'prepared_thumbnails',
+    )
+    model = Post
+
+    def __init__(self, id, text, excerpt, pub_date, image, author_id,
+                 group_id, author_username, group_slug, group_title):
+        self.id = id
+        self.text = text
+        self.excerpt = excerpt
+        self.pub_date = pub_date
+        self.image = IMAGE_FIELD.attr_class(self, IMAGE_FIELD, image)
+        self.author_id = author_id
+        self.group_id = group_id
+        self.author = AuthorRow(author_id, author_username)
+        self.group = (GroupRow(group_id, group_slug, group_title)
+                      if group_id is not None else None)
+        self.image_variants = Variants()
+
+    def __str__(self):
+        return self.text[:15]
+
+    @property
+    def has_more(self):
+        return bodies.has_more(self.text)
+
+
+def post_values(queryset):
+    """Колонки карточки для queryset постов, по строке-кортежу на пост."""
+    return queryset.annotate(
+        **{name: F(path) for name, path in JOINED.items()}
+    ).values_list(*POST_COLUMNS, *JOINED, named=True)
+
+
+def feed_values(queryset):
+    """Колонки карточки для queryset записей ленты (FeedItem)."""
+    return queryset.annotate(
+        **{name: F(path) for name, path in FEED_COLUMNS.items()}
+    ).values_list(
+        'post_id', 'text', 'excerpt', 'pub_date', 'image', 'author_id',
+        'group_id', *JOINED, named=True)
+
+
+def build(values):
+    """Строки постов из кортежей post_values()/feed_values().
+
+    Варианты картинок подтягиваются одним запросом и только для
+    постов с картинкой.
+    """
+    posts = [PostRow(*value) for value in values]
+    with_image = {post.pk: post for post in posts if post.image}
+    if with_image:
+        variants = {}
+        for variant in PostImageVariant.objects.filter(
+                post_id__in=with_image):
+            variants.setdefault(variant.post_id, []).append(variant)
+        for pk, post in with_image.items():
+            post.image_variants = Variants(variants.get(pk, ()))
+    return posts
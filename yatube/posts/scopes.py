@@ -0,0 +1,18 @@
+"""Области кеша страниц с постами для core.versions."""
+INDEX = 'index'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def feed(user_id):
+    return f'feed:{user_id}'
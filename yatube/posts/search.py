@@ -0,0 +1,176 @@
+"""Полнотекстовый поиск по постам на FTS5.
+
+Индекс posts_post_fts — external content таблица поверх posts_post:
+триггеры из миграции 0011 держат её в согласии с Post.text при любых
+вставках, изменениях и удалениях, включая bulk_create и update().
+Выдача сортируется по bm25 и листается курсором по паре (rank, id).
+
+На SQLite любое изменение схемы posts_post пересоздаёт таблицу и
+теряет триггеры, поэтому такие миграции должны выполнить TRIGGERS
+заново (см. миграции 0011 и 0013).
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+from .utils import CursorPage
+
+FTS_TABLE = 'posts_post_fts'
+
+WORD_RE = re.compile(r'\w+')
+
+# External content таблица: тексты не дублируются, индекс ссылается
+# на posts_post.id через rowid.
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert "
+    "AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete "
+    "AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update "
+    "AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+DROP = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def to_match(query):
+    """Превращает ввод пользователя в выражение MATCH или None.
+
+    Каждое слово берётся в кавычки, поэтому синтаксис FTS5 (OR, NEAR,
+    звёздочки) из запроса не исполняется; слова объединяются по AND.
+    """
+    words = WORD_RE.findall(query or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def matching_ids(match):
+    """Подзапрос id постов, подходящих под выражение MATCH."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    )
+
+
+def rebuild():
+    """Восстанавливает триггеры и перестраивает индекс по posts_post."""
+    with connection.cursor() as cursor:
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute(REBUILD)
+
+
+def check():
+    """Сверяет индекс с posts_post; бросает DatabaseError при расхождении."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) "
+            "VALUES ('integrity-check', 1)")
+
+
+def optimize():
+    """Сливает сегменты индекса в один."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class SearchPaginator:
+    """Курсорная пагинация результатов поиска по (rank, id).
+
+    Повторяет интерфейс CursorPaginator, поэтому страница — обычный
+    CursorPage и подходит для includes/paginator.html.
+    """
+    def __init__(self, match, per_page, queryset=None, transform=None):
+        self.match = match
+        self.per_page = int(per_page)
+        self.queryset = queryset if queryset is not None else Post.objects
+        self.transform = transform
+
+    def encode(self, post):
+        return urlsafe_base64_encode(
+            f'{post.search_rank!r}|{post.pk}'.encode())
+
+    def decode(self, token):
+        """Возвращает ключи из токена или None, если токен испорчен."""
+        try:
+            rank, pk = force_str(urlsafe_base64_decode(token)).split('|')
+            return float(rank), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+
+    def get_page(self, after=None, before=None):
+        after = after and self.decode(after)
+        before = before and self.decode(before)
+        return CursorPage(self, after=after or None, before=before or None)
+
+    def _ranked_ids(self, after=None, before=None):
+        sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s')
+        params = [self.match]
+        if before is not None:
+            rank, pk = before
+            sql += (' AND (rank < %s OR (rank = %s AND rowid < %s))'
+                    ' ORDER BY rank DESC, rowid DESC')
+            params += [rank, rank, pk]
+        else:
+            if after is not None:
+                rank, pk = after
+                sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+                params += [rank, rank, pk]
+            sql += ' ORDER BY rank, rowid'
+        sql += ' LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def fetch(self, after=None, before=None):
+        """Возвращает посты страницы и курсоры соседних страниц."""
+        if self.match is None:
+            return [], None, None
+        ranked = self._ranked_ids(after, before)
+        has_more = len(ranked) > self.per_page
+        ranked = ranked[:self.per_page]
+        if before is not None:
+            ranked.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after is not None
+        posts = self.queryset.in_bulk([pk for pk, _ in ranked])
+        rows = []
+        for pk, rank in ranked:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_rank = rank
+                rows.append(post)
+        next_cursor = self.encode(rows[-1]) if rows and has_next else None
+        previous_cursor = (
+            self.encode(rows[0]) if rows and has_previous else None)
+        if self.transform is not None:
+            rows = self.transform(rows)
+        return rows, next_cursor, previous_cursor
@@ -0,0 +1,119 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import versions
+from . import counters, feed, scopes
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def add_post_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed_on_unfollow(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._saved_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        keys = [counters.TOTAL_POSTS,
+                counters.author_posts_key(instance.author_id)]
+        if instance.group_id is not None:
+            keys.append(counters.group_posts_key(instance.group_id))
+        counters.change(*keys)
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            counters.change(counters.group_posts_key(old_group_id), delta=-1)
+        if instance.group_id is not None:
+            counters.change(counters.group_posts_key(instance.group_id))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    keys = [counters.TOTAL_POSTS,
+            counters.author_posts_key(instance.author_id)]
+    if instance.group_id is not None:
+        keys.append(counters.group_posts_key(instance.group_id))
+    counters.change(*keys, delta=-1)
+    counters.forget(counters.post_comments_key(instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_counter(sender, instance, **kwargs):
+    counters.forget(counters.group_posts_key(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.post_comments_key(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change(counters.post_comments_key(instance.post_id), delta=-1)
+
+
+def _post_scopes(post, *group_ids):
+    affected = [scopes.INDEX, scopes.author(post.author_id),
+                scopes.post(post.pk)]
+    readers = feed.followers([post.author_id])
+    affected.extend(scopes.feed(user_id) for user_id in readers)
+    affected.extend(
+        scopes.group(group_id) for group_id in group_ids
+        if group_id is not None)
+    return affected
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, **kwargs):
+    versions.bump(*_post_scopes(
+        instance,
+        instance.group_id,
+        getattr(instance, '_saved_group_id', None),
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    versions.bump(*_post_scopes(instance, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    versions.bump(scopes.post(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # Название и slug группы видны в карточках на главной и в профилях.
+    authors = Post.objects.filter(group=instance).values_list(
+        'author_id', flat=True).distinct()
+    versions.bump(
+        scopes.INDEX,
+        scopes.group(instance.pk),
+        *(scopes.author(author_id) for author_id in authors),
+        *(scopes.feed(user_id) for user_id in feed.followers(authors)),
+    )
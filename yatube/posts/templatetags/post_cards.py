@@ -0,0 +1,74 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+KEY_PREFIX = 'card:'
+
+
+def card_version(post, geometry):
+    """Версия карточки: хеш всего, что в неё попадает.
+
+    Правка текста, переименование группы или автора и готовая миниатюра
+    меняют версию сами, без сигналов и лишних чтений кеша. None —
+    карточку нельзя кешировать: миниатюра не разложена по странице
+    (thumbnails.attach) и неизвестно, готова ли она.
+    """
+    parts = [
+        post.pk, post.text, post.excerpt, post.pub_date.isoformat(),
+        post.author.username,
+        post.group.slug if post.group_id is not None else '',
+        post.image.name,
+    ]
+    if post.image:
+        variants = post.image_variants.all()
+        if variants:
+            parts.extend(
+                (variant.pk, variant.image.name) for variant in variants)
+        else:
+            prepared = getattr(post, 'prepared_thumbnails', {})
+            if geometry not in prepared:
+                return None
+            thumbnail = prepared[geometry]
+            parts.append(thumbnail.name if thumbnail is not None else '')
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def card_key(post, geometry):
+    version = card_version(post, geometry)
+    if version is None:
+        return None
+    return f'{KEY_PREFIX}{post.pk}:{geometry}:{version}'
+
+
+@register.filter
+def post_cards(posts, geometry):
+    """HTML карточек постов ленты; неизменившиеся берутся из кеша.
+
+    {% for card in page_obj|post_cards:"960x339" %}{{ card }}{% endfor %}
+
+    Все карточки страницы читаются одним get_many, рендерятся только
+    промахи. Карточка рендерится в отдельном контексте с одним постом,
+    поэтому её можно отдавать любому читателю.
+    """
+    posts = list(posts)
+    keys = [card_key(post, geometry) for post in posts]
+    cached = cache.get_many([key for key in keys if key is not None])
+    card = get_template(CARD_TEMPLATE)
+    rendered, missing = [], {}
+    for post, key in zip(posts, keys):
+        html = cached.get(key)
+        if html is None:
+            html = card.render({'post': post, 'geometry': geometry})
+            if key is not None:
+                missing[key] = html
+        rendered.append(mark_safe(html))
+    if missing:
+        cache.set_many(missing, settings.PAGE_CACHE_TIMEOUT)
+    return rendered
@@ -0,0 +1,49 @@
+from django import template
+
+from posts import thumbnails
+from posts.models import PostImageVariant
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{variant.image.url} {variant.width}w' for variant in variants)
+
+
+@register.inclusion_tag('posts/includes/image.html')
+def post_image(image, geometry):
+    """Адаптивная картинка из вариантов поста.
+
+    Варианты берутся из prefetch_related('image_variants'); для старых
+    постов без вариантов — готовая миниатюра, а пока её нет — оригинал.
+    Миниатюры, разложенные по странице thumbnails.attach(), повторно
+    не ищутся.
+    """
+    if not image:
+        return {}
+    post = image.instance
+    # Сортировка в Python: ORDER BY в prefetch по IN (...) — это
+    # лишняя сортировка во временном B-дереве на каждой странице.
+    variants = sorted(
+        post.image_variants.all(), key=lambda variant: variant.width)
+    if not variants:
+        prepared = getattr(post, 'prepared_thumbnails', {})
+        if geometry in prepared:
+            thumbnail = prepared[geometry]
+        else:
+            thumbnail = thumbnails.lookup(image.name, geometry)
+        return {
+            'image': image,
+            'thumbnail': thumbnail,
+        }
+    webp = [v for v in variants if v.format == PostImageVariant.WEBP]
+    jpeg = [v for v in variants if v.format == PostImageVariant.JPEG]
+    width = geometry.split('x')[0]
+    return {
+        'image': image,
+        'fallback': jpeg[-1] if jpeg else None,
+        'webp_srcset': _srcset(webp),
+        'jpeg_srcset': _srcset(jpeg),
+        'sizes': f'(max-width: {width}px) 100vw, {width}px',
+    }
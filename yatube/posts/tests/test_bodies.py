@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import bodies
+from posts.models import Post, User
+
+LONG_TEXT = 'слово ' * 100
+
+
+class PostBodyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_save_renders_escaped_html(self):
+        post = Post.objects.create(
+            author=self.author, text='<b>жирный</b>\nвторая строка')
+        self.assertEqual(
+            post.text_html,
+            '&lt;b&gt;жирный&lt;/b&gt;<br>вторая строка')
+        self.assertEqual(post.excerpt, post.text_html)
+        self.assertFalse(post.has_more)
+
+    def test_long_text_gets_excerpt_and_read_more(self):
+        post = Post.objects.create(author=self.author, text=LONG_TEXT)
+        self.assertTrue(post.has_more)
+        self.assertLess(len(post.excerpt), len(post.text_html))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.excerpt, html=False)
+        self.assertNotContains(response, post.text_html, html=False)
+        self.assertContains(response, 'читать дальше')
+
+    def test_edit_rerenders_html(self):
+        post = Post.objects.create(author=self.author, text='Старый текст')
+        self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Новый\nтекст'})
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Новый<br>текст')
+        self.assertEqual(post.excerpt, 'Новый<br>текст')
+
+    def test_backfill_command(self):
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Из bulk_create'),
+            Post(author=self.author, text=LONG_TEXT),
+        ])
+        out = StringIO()
+        call_command('render_post_bodies', stdout=out)
+        self.assertIn('Обновлено постов: 2', out.getvalue())
+        for post in Post.objects.all():
+            with self.subTest(post=post.pk):
+                self.assertEqual(
+                    post.text_html, bodies.render_html(post.text))
+                self.assertEqual(
+                    post.excerpt, bodies.render_excerpt(post.text))
+        call_command('render_post_bodies', stdout=out)
+        self.assertIn('Обновлено постов: 0', out.getvalue())
+
+    def test_backfill_writes_in_batches(self):
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(5)
+        ])
+        with self.assertNumQueries(4):
+            self.assertEqual(
+                bodies.backfill(Post.objects.all(), batch_size=2), 5)
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+
+    def test_update_clears_stale_html(self):
+        post = Post.objects.create(author=self.author, text='Старый текст')
+        Post.objects.filter(pk=post.pk).update(text='Новый текст')
+        post.refresh_from_db()
+        self.assertEqual((post.text_html, post.excerpt), ('', ''))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'Новый текст')
+        post.save()
+        Post.objects.filter(pk=post.pk).update(text='Новый текст')
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Новый текст')
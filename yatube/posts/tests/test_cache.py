@@ -0,0 +1,217 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core import cache as backends, singleflight, swr
+from core.cache import L1Store, SQLiteCache, TieredCache
+
+
+def _increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+def _rebuild(location, results):
+    cache = SQLiteCache(location, {})
+
+    def compute():
+        cache.incr('computed')
+        time.sleep(0.3)
+        return 'page'
+
+    results.put(singleflight.get_or_set('index', compute, 60, cache=cache))
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_shared_between_instances(self):
+        other = SQLiteCache(self.location, {})
+        self.cache.set_many({'a': 1, 'b': {'list': [1, 2]}})
+        self.assertEqual(
+            other.get_many(['a', 'b', 'c']), {'a': 1, 'b': {'list': [1, 2]}})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.cache.set('key', 'gone', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'third'))
+        self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_increment, args=(self.location, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 800)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_many_skips_missing_keys(self):
+        self.cache.set_many({'a': 1, 'b': 10, 'text': 'x'})
+        self.assertEqual(
+            self.cache.incr_many(['a', 'b', 'text', 'missing']),
+            {'a': 2, 'b': 11})
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'a': 2, 'b': 11})
+
+    def test_old_sqlite_rejected(self):
+        with mock.patch.object(
+                backends.sqlite3, 'sqlite_version_info', (3, 31, 1)):
+            with self.assertRaisesMessage(ImproperlyConfigured, '3.35.0'):
+                SQLiteCache(self.location, {})
+
+    def test_evicts_least_recently_read(self):
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_BYTES': 3000}})
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 500)
+        self.assertLessEqual(
+            cache.db.execute('SELECT total FROM cache_stats').fetchone()[0],
+            3000)
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key9'), 'x' * 500)
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Два экземпляра с разными L1 изображают два процесса."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 60}}
+        location = os.path.join(self.directory, 'generation')
+        self.first = TieredCache(location, params)
+        self.second = TieredCache(location, params)
+        self.second.l1 = L1Store(max_entries=2, timeout=60)
+        self.shared = caches['shared']
+        self.shared.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_reads_served_from_l1(self):
+        self.first.set('key', 'value')
+        self.shared.set('key', 'changed behind the back')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'changed behind the back')
+
+    def test_delete_and_incr_invalidate_other_processes(self):
+        self.first.set('key', 'value')
+        self.first.set('version', 1)
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('version'), 1)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.first.incr('version')
+        self.assertEqual(self.second.get('version'), 2)
+
+    def test_incr_many_broadcasts_once(self):
+        self.first.set_many({'a': 1, 'b': 1})
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 1, 'b': 1})
+        generation = self.first.generation.value
+        self.assertEqual(
+            self.first.incr_many(['a', 'b', 'missing']), {'a': 2, 'b': 2})
+        self.assertEqual(self.first.generation.value, generation + 1)
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 2, 'b': 2})
+
+    def test_l1_is_bounded(self):
+        self.second.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(self.second.l1.entries), [
+            self.second.make_key('b'), self.second.make_key('c')])
+        self.assertEqual(self.second.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2, 'c': 3})
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_concurrent_misses_compute_once(self):
+        self.cache.set('computed', 0)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_rebuild, args=(self.location, results))
+            for _ in range(6)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual([results.get() for _ in workers], ['page'] * 6)
+        self.assertEqual(self.cache.get('computed'), 1)
+        self.assertIsNone(self.cache.get(singleflight.LOCK_PREFIX + 'index'))
+
+    @override_settings(SINGLE_FLIGHT_WAIT=0.1)
+    def test_waiter_computes_when_holder_is_stuck(self):
+        token = self.cache.lock(singleflight.LOCK_PREFIX + 'index', 60)
+        self.assertIsNotNone(token)
+        self.assertEqual(singleflight.get_or_set(
+            'index', lambda: 'page', 60, cache=self.cache), 'page')
+        self.assertFalse(self.cache.unlock(
+            singleflight.LOCK_PREFIX + 'index', token + 1))
+        self.assertTrue(self.cache.unlock(
+            singleflight.LOCK_PREFIX + 'index', token))
+
+
+@override_settings(SWR_SOFT_TIMEOUT=0, SWR_REFRESH_WORKERS=1)
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'), {})
+        self.calls = []
+
+    def tearDown(self):
+        swr.drain()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def compute(self):
+        self.calls.append(len(self.calls) + 1)
+        return f'v{len(self.calls)}'
+
+    def get(self):
+        return swr.get_or_set('index', self.compute, 60, cache=self.cache)
+
+    def test_stale_value_served_while_refreshing(self):
+        refreshed = swr.stats.refreshed
+        self.assertEqual(self.get(), 'v1')
+        self.assertEqual(self.get(), 'v1')
+        swr.drain()
+        self.assertEqual(self.calls, [1, 2])
+        self.assertEqual(self.cache.get('index').value, 'v2')
+        snapshot = swr.stats.snapshot()
+        self.assertEqual(snapshot['refreshed'], refreshed + 1)
+        self.assertEqual(snapshot['queue_depth'], 0)
+
+    @override_settings(SWR_REFRESH_WORKERS=0)
+    def test_synchronous_refresh_without_workers(self):
+        self.assertEqual(self.get(), 'v1')
+        self.assertEqual(self.get(), 'v2')
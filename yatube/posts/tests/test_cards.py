@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+CARD = 'posts/includes/post_card.html'
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(3))
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, posts):
+        return Template(
+            "{% include 'posts/includes/posts.html' %}"
+        ).render(Context({'page_obj': posts}))
+
+    def posts(self):
+        return list(Post.objects.select_related('author', 'group'))
+
+    def test_cards_cached_across_pages(self):
+        posts = self.posts()
+        first = self.render(posts)
+        with self.assertNumQueries(0), self.assertTemplateNotUsed(CARD):
+            self.assertEqual(self.render(posts), first)
+        with self.assertTemplateUsed(CARD) as used:
+            self.render(posts[:2] + [Post(
+                pk=100, author=self.author, text='Новый',
+                pub_date=posts[0].pub_date)])
+        self.assertEqual(used.rendered_template_names.count(CARD), 1)
+
+    def test_changed_post_gets_new_card(self):
+        posts = self.posts()
+        self.render(posts)
+        posts[0].text = 'Исправленный текст'
+        self.assertIn('Исправленный текст', self.render(posts))
+
+    def test_group_page_uses_shared_card(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertTemplateUsed(response, CARD)
+        self.assertContains(response, 'Пост 2')
@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import counters
+from posts.models import Comment, Counter, Group, Post, User
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа 1', slug='group-1', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Группа 2', slug='group-2', description='Описание')
+
+    def assert_counts_match(self):
+        self.assertEqual(counters.posts_count(), Post.objects.count())
+        self.assertEqual(
+            counters.author_posts_count(self.user.pk),
+            Post.objects.filter(author=self.user).count())
+        for group in (self.group, self.other_group):
+            self.assertEqual(
+                counters.group_posts_count(group.pk), group.posts.count())
+
+    def test_counters_follow_create_edit_and_delete(self):
+        self.assert_counts_match()
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост')
+        self.assert_counts_match()
+        post.group = self.other_group
+        post.save()
+        self.assert_counts_match()
+        post.delete()
+        self.assert_counts_match()
+
+    def test_comment_counter_and_cascade(self):
+        author = User.objects.create(username='leaving_author')
+        post = Post.objects.create(author=author, text='Пост')
+        self.assertEqual(counters.comments_count(post.pk), 0)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        self.assertEqual(counters.comments_count(post.pk), 1)
+        author.delete()
+        self.assertEqual(counters.posts_count(), 0)
+        self.assertFalse(Counter.objects.filter(
+            key=counters.post_comments_key(post.pk)).exists())
+
+    def test_reconcile_repairs_drift(self):
+        posts = [
+            Post.objects.create(
+                author=self.user, group=self.group, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        for number in range(3):
+            Comment.objects.create(
+                post=posts[0], author=self.user, text=f'Комментарий {number}')
+        self.assert_counts_match()
+        self.assertEqual(counters.reconcile(), {})
+        Counter.objects.update(value=100)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assert_counts_match()
+        self.assertEqual(counters.comments_count(posts[0].pk), 3)
@@ -0,0 +1,76 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core import versions
+from posts import feed, scopes
+from posts.models import FeedItem, Follow, Post, User
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def feed_post_ids(self):
+        return list(FeedItem.objects.filter(
+            user=self.reader).values_list('post_id', flat=True))
+
+    def test_follow_backfills_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed_post_ids(), [self.old_post.pk])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            self.feed_post_ids(), [new_post.pk, self.old_post.pk])
+
+    def test_post_change_bumps_follower_feeds_at_once(self):
+        readers = [self.reader, User.objects.create(username='second')]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        feeds = [scopes.feed(reader.pk) for reader in readers]
+        before = versions.get_versions(*feeds)
+        generation = cache.generation.value
+        self.old_post.text = 'Исправленный пост'
+        self.old_post.save()
+        after = versions.get_versions(*feeds)
+        for scope in feeds:
+            with self.subTest(scope=scope):
+                self.assertNotEqual(after[scope], before[scope])
+        self.assertEqual(cache.generation.value, generation + 1)
+
+    def test_unfollow_and_delete_prune_feed(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        new_post.delete()
+        self.assertEqual(self.feed_post_ids(), [self.old_post.pk])
+        follow.delete()
+        self.assertEqual(self.feed_post_ids(), [])
+
+    def test_rebuild_feed_repairs_drift(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_feed', '--check', stdout=StringIO(),
+                         stderr=StringIO())
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertEqual(self.feed_post_ids(), [self.old_post.pk])
+
+    def test_failed_rebuild_keeps_old_feeds(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(feed, '_fill', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                feed.rebuild()
+        self.assertEqual(self.feed_post_ids(), [self.old_post.pk])
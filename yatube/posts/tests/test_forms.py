@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from posts.models import Post, Group, User, Comment
+from PIL import Image
+
+from posts.models import Post, Group, User, Comment, PostImageVariant
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -119,3 +122,35 @@ class PostFormsTests(TestCase):
         )
 
         self.assertNotEqual(Comment.objects.last().text, form_data['text'])
+
+    @override_settings(
+        POST_IMAGE_MAX_SIZE=(30, 30), POST_IMAGE_WIDTHS=(5, 10))
+    def test_image_normalized_on_upload(self):
+        """Картинка повёрнута по EXIF, без метаданных, ужата и нарезана."""
+        image = Image.new('RGB', (60, 20), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        uploaded = SimpleUploadedFile(
+            'rotated.jpg', buffer.getvalue(), content_type='image/jpeg')
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Повёрнутая картинка', 'image': uploaded},
+        )
+        post = Post.objects.get(text='Повёрнутая картинка')
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (10, 30))
+            self.assertEqual(saved.format, 'JPEG')
+            self.assertEqual(len(saved.getexif()), 0)
+        variants = post.image_variants.values_list('format', 'width', 'height')
+        self.assertCountEqual(variants, [
+            (PostImageVariant.WEBP, 5, 15),
+            (PostImageVariant.JPEG, 5, 15),
+            (PostImageVariant.WEBP, 10, 30),
+            (PostImageVariant.JPEG, 10, 30),
+        ])
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-5w.jpg 5w')
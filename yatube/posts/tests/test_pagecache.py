@@ -0,0 +1,233 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def warm(self, url):
+        # Первый показ может досчитать счётчики, то есть записать в базу,
+        # и такой ответ ставит cookie реплик, а с cookie в кеш не кладут.
+        self.client.get(url)
+        return self.client.get(url)
+
+    def test_repeat_request_served_from_cache(self):
+        url = reverse('posts:index')
+        self.assertTemplateUsed(self.client.get(url), 'posts/index.html')
+        first = self.warm(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_cached_page_keeps_security_headers(self):
+        url = reverse('posts:index')
+        first = self.warm(url)
+        second = self.client.get(url)
+        self.assertTemplateNotUsed(second, 'posts/index.html')
+        self.assertEqual(second['X-Frame-Options'], first['X-Frame-Options'])
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_conditional_requests_get_304(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.warm(url)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        index = self.warm(reverse('posts:index'))
+        self.assertNotIn('Last-Modified', index)
+        self.assertEqual(self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=index['ETag'],
+        ).status_code, 304)
+
+    def test_edit_not_hidden_by_if_modified_since(self):
+        url = reverse('posts:index')
+        self.warm(url)
+        self.post.text = 'Правка'
+        self.post.save()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertContains(response, 'Правка')
+
+    def test_writes_invalidate_pages(self):
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.warm(detail)['ETag']
+        self.warm(index)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        Comment.objects.create(
+            author=self.author, post=self.post, text='Свежий комментарий')
+        self.assertContains(self.client.get(index), 'Свежий пост')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_logged_in_user_never_gets_cached_page(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        anonymous = self.warm(url)
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/profile.html')
+        self.assertNotEqual(response.content, anonymous.content)
+        self.assertNotIn('ETag', response)
+
+
+class PunchedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, url):
+        self.client.force_login(user)
+        return self.client.get(url)
+
+    def test_shared_body_rendered_once(self):
+        url = reverse('posts:index')
+        self.assertTemplateUsed(self.get(self.author, url), 'posts/index.html')
+        response = self.get(self.stranger, url)
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        self.assertContains(response, 'stranger')
+        self.assertNotContains(response, 'follower')
+
+    def test_follow_button_is_personal(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertContains(self.get(self.follower, url), 'Отписаться')
+        response = self.get(self.stranger, url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+        self.assertNotContains(response, 'follower')
+
+    def test_edit_link_and_comment_form_are_personal(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.assertContains(self.get(self.author, url), edit)
+        response = self.get(self.stranger, url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertNotContains(response, edit)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('csrftoken', response.cookies)
+        self.assertNotContains(response, '<!--hole:')
+        self.client.logout()
+        self.assertNotContains(
+            self.client.get(url), 'csrfmiddlewaretoken')
+
+
+class RefreshTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=cls.staff, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SWR_SOFT_TIMEOUT=0)
+    def test_stale_page_rebuilt_without_workers(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.get(url)
+        self.assertTemplateUsed(self.client.get(url), 'posts/index.html')
+
+    def test_refresh_stats_for_staff_only(self):
+        url = reverse('core:refresh_stats')
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        stats = self.client.get(url).json()
+        self.assertIn('queue_depth', stats)
+        self.assertIn('latency_avg_ms', stats)
+
+
+class PostConditionalTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def test_unchanged_post_gets_304_before_comments(self):
+        self.client.force_login(self.reader)
+        etag = self.client.get(self.url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        # Сессия, пользователь и версия поста; комментарии не читаются.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_viewer(self):
+        anonymous = self.client.get(self.url)['ETag']
+        self.client.force_login(self.reader)
+        reader = self.client.get(self.url)['ETag']
+        self.client.force_login(self.author)
+        author = self.client.get(self.url)['ETag']
+        self.assertEqual(len({anonymous, reader, author}), 3)
+
+    def test_comment_and_edit_bump_version(self):
+        self.client.force_login(self.author)
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Комментарий')
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Правка'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 3)
+        self.assertContains(self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']), 'Правка')
+
+    def test_group_rename_not_hidden_by_if_modified_since(self):
+        group = Group.objects.create(title='Старое название', slug='group')
+        self.post.group = group
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertContains(response, 'Новое название')
+
+    def test_shared_body_gets_viewer_etag(self):
+        self.client.force_login(self.reader)
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertEqual(self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.plans import find_problems
+from core.queries import QueryInspector, check_budget
+from posts.models import Comment, Follow, Group, Post, User
+from posts.urls import urlpatterns
+
+GET_VIEWS_WITHOUT_BUDGET = {
+    'posts:post_create',
+    'posts:post_edit',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+}
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        authors = [User.objects.create(username=f'author_{i}')
+                   for i in range(12)]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                author=author, group=cls.group, text='Пост')
+            Comment.objects.create(post=post, author=author, text='Текст')
+        cls.post = post
+        cls.author = authors[0]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[self.group.slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[self.author.username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[self.post.pk]),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:comments': reverse('posts:comments', args=[self.post.pk]),
+            'posts:search': reverse('posts:search') + '?q=Пост',
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with QueryInspector() as inspector:
+            self.client.get(url)
+        return inspector
+
+    def test_every_posts_view_has_budget(self):
+        names = {f'posts:{pattern.name}' for pattern in urlpatterns}
+        self.assertEqual(
+            names - GET_VIEWS_WITHOUT_BUDGET, set(settings.QUERY_BUDGETS))
+
+    def test_views_within_budget(self):
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                inspector = self.count_queries(url)
+                self.assertIsNone(check_budget(name, inspector))
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                with self.settings(CONST=2):
+                    small = len(self.count_queries(url))
+                with self.settings(CONST=10):
+                    large = len(self.count_queries(url))
+                self.assertEqual(small, large)
+
+    def test_views_use_indexes(self):
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                inspector = self.count_queries(url)
+                allowed = settings.QUERY_PLAN_ALLOWED.get(name, ())
+                self.assertEqual(find_problems(inspector, allowed), [])
+
+    def test_inspector_reports_lazy_load_in_template(self):
+        comments = list(Comment.objects.all())
+        with QueryInspector() as inspector:
+            render_to_string(
+                'posts/includes/comment_list.html', {'comments': comments})
+        self.assertEqual(len(inspector.lazy_loads), len(comments))
+        lazy_load = inspector.lazy_loads[0]
+        self.assertEqual(lazy_load.field, 'posts.Comment.author')
+        self.assertTrue(lazy_load.template.endswith(
+            'posts/includes/comment_list.html'))
+        self.assertIn(str(len(comments)), inspector.report())
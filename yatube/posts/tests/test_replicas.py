@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import replicas
+from posts.models import Post, User
+
+REPLICA = 'test_replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaTests(TransactionTestCase):
+    """Реплика — настоящая копия тестовой базы в файле."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(self.directory, 'replica.sqlite3'),
+        }
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Пост до синхронизации')
+        replicas.sync(REPLICA)
+        self.new_post = Post.objects.create(
+            author=self.author, text='Пост после синхронизации')
+
+    def tearDown(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_index(self, **params):
+        response = self.client.get(reverse('posts:index'), params)
+        return response.wsgi_request.read_replica, list(
+            response.context['page_obj'])
+
+    def test_router(self):
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        with replicas.reading_from_replicas():
+            self.assertEqual(router.db_for_read(Post), REPLICA)
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate(REPLICA, 'posts'))
+
+    def test_stale_replica_not_read_until_sync(self):
+        posts = [self.new_post, self.old_post]
+        self.assertEqual(self.get_index(), (False, posts))
+        replicas.sync(REPLICA)
+        # Другой адрес — мимо кеша страниц.
+        self.assertEqual(self.get_index(page=1), (True, posts))
+
+    def test_replica_copy_without_wal(self):
+        replicas.sync(REPLICA)
+        path = connections[REPLICA].settings_dict['NAME']
+        with connections[REPLICA].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+            cursor.execute('SELECT COUNT(*) FROM posts_post')
+            self.assertEqual(cursor.fetchone()[0], 2)
+        self.assertFalse(os.path.exists(path + '-wal'))
+
+    def test_writer_reads_primary(self):
+        self.client.post(
+            reverse('posts:add_comment', args=[self.old_post.pk]),
+            {'text': 'Комментарий'})
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, self.client.cookies)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.wsgi_request.read_replica)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.new_post, self.old_post])
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import rows
+from posts.models import FeedItem, Follow, Group, Post, User
+
+
+class PostRowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='С группой',
+            image='posts/photo.jpg')
+        cls.plain = Post.objects.create(author=cls.author, text='Без группы')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_match_models(self):
+        models = list(Post.objects.select_related('author', 'group'))
+        built = rows.build(rows.post_values(Post.objects.all()))
+        self.assertEqual(built, models)
+        for row, post in zip(built, models):
+            with self.subTest(post=post.pk):
+                self.assertEqual(row.author, post.author)
+                self.assertEqual(str(row.author), post.author.username)
+                self.assertEqual(row.group, post.group)
+                self.assertEqual(row.image.name, post.image.name)
+                self.assertIs(row.image.instance, row)
+        self.assertFalse(hasattr(built[0], '__dict__'))
+
+    def test_card_html_matches_models(self):
+        template = Template(
+            "{% include 'posts/includes/post_card.html' %}")
+        built = rows.build(rows.post_values(Post.objects.all()))
+        for row, post in zip(
+                built, Post.objects.select_related('author', 'group')):
+            with self.subTest(post=post.pk):
+                self.assertHTMLEqual(
+                    template.render(Context({'post': row})),
+                    template.render(Context({'post': post})))
+
+    def test_feed_rows(self):
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 2)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        page = list(response.context['page_obj'])
+        self.assertEqual(page, [self.plain, self.post])
+        self.assertIsInstance(page[0], rows.PostRow)
+        self.assertEqual(page[1].group.slug, self.group.slug)
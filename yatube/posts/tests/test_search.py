@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.settings import CONST
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.weak = Post.objects.create(
+            author=cls.author, text='Сегодня пеку пироги с капустой')
+        cls.strong = Post.objects.create(
+            author=cls.author, text='Пироги, пироги и ещё раз ПИРОГИ')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Про погоду')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+
+    def test_search_ranks_matches(self):
+        response = self.search('пироги')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.strong, self.weak])
+
+    def test_search_ignores_fts_syntax(self):
+        response = self.search('пироги OR погоду*')
+        self.assertEqual(list(response.context['page_obj']), [])
+        self.assertEqual(list(self.search('').context['page_obj']), [])
+
+    def test_index_follows_edit_and_delete(self):
+        other = Post.objects.get(pk=self.other.pk)
+        other.text = 'Пироги к чаю'
+        other.save()
+        Post.objects.get(pk=self.strong.pk).delete()
+        response = self.search('пироги')
+        self.assertCountEqual(
+            response.context['page_obj'], [self.weak, self.other])
+        self.assertEqual(list(self.search('погоду').context['page_obj']), [])
+
+    def test_search_cursor_pages(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Блины №{i}')
+            for i in range(CONST + 3))
+        first = self.search('блины').context['page_obj']
+        second = self.search(
+            'блины', after=first.next_cursor).context['page_obj']
+        self.assertEqual(len(first), CONST)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+        back = self.search(
+            'блины', before=second.previous_cursor).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/')
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'капустой')
+        self.assertEqual(list(queryset), [self.weak])
+        self.assertFalse(use_distinct)
+
+    def test_rebuild_search_index_repairs_drift(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+                "VALUES ('delete', %s, %s)", [self.weak.pk, self.weak.text])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_search_index', '--check', stdout=StringIO())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            list(self.search('капустой').context['page_obj']), [self.weak])
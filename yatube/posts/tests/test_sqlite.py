@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from core import sqlite
+
+
+class SqliteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_gets_pragmas(self):
+        self.assertEqual(
+            self.pragma('busy_timeout'),
+            settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(
+            self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        # 1 — NORMAL.
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_health_reports_sizes(self):
+        report = sqlite.health()
+        self.assertGreater(report['database_bytes'], 0)
+        self.assertGreaterEqual(report['wal_bytes'], 0)
+
+    def test_maintenance_thread_stops(self):
+        thread = sqlite.MaintenanceThread(
+            interval=60, optimize_every=60, wal_limit=0)
+        thread.start()
+        thread.stop()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
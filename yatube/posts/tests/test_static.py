@@ -0,0 +1,91 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from core import staticfiles
+
+CSS = 'body { color: black; }\n' * 50
+
+STATIC_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(STATICFILES_DIRS=[STATIC_DIR], STATIC_ROOT=STATIC_ROOT)
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(STATIC_DIR, 'css'))
+        with open(os.path.join(STATIC_DIR, 'css', 'site.css'), 'w') as css:
+            css.write(CSS)
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_DIR, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+
+    def static(self, name):
+        return Template('{% load static %}{% static name %}').render(
+            Context({'name': name}))
+
+    def test_static_tag_resolves_hashed_name(self):
+        url = self.static('css/site.css')
+        self.assertRegex(url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        path = staticfiles_storage.path(url[len(settings.STATIC_URL):])
+        with open(path + '.gz', 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()).decode(), CSS)
+
+    def test_missing_file_keeps_plain_name(self):
+        self.assertEqual(self.static('css/missing.css'),
+                         '/static/css/missing.css')
+
+    def test_gzip_negotiated_and_cached_forever(self):
+        url = self.static('css/site.css')
+        response = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip, deflate, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), CSS)
+
+    @skipUnless(staticfiles.brotli, 'brotli не установлен')
+    def test_brotli_written_and_preferred(self):
+        url = self.static('css/site.css')
+        path = staticfiles_storage.path(url[len(settings.STATIC_URL):])
+        with open(path + '.br', 'rb') as compressed:
+            self.assertEqual(
+                staticfiles.brotli.decompress(compressed.read()).decode(), CSS)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = b''.join(response.streaming_content)
+        self.assertEqual(staticfiles.brotli.decompress(body).decode(), CSS)
+
+    def test_plain_file_without_accept_encoding(self):
+        response = self.client.get(self.static('css/site.css'))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(), CSS)
+
+    def test_unhashed_name_revalidated(self):
+        response = self.client.get('/static/css/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(
+            '/static/css/site.css',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        ).status_code, 304)
+        self.assertEqual(
+            self.client.get('/static/../manage.py').status_code, 404)
@@ -7,7 +7,10 @@ from django.core.cache import cache
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from posts import thumbnails
 from posts.models import Post, Group, User, Follow, Comment
 from yatube.settings import CONST
 
@@ -139,6 +142,17 @@ class PostPagesTests(TestCase):
 
         self.assertEqual(context_author, self.user.username)
 
+    def test_profile_checks_subscription_once(self):
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        for client in (self.authorized_client, self.client):
+            with self.subTest(authorized=client is self.authorized_client):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                follow_queries = [query for query in queries.captured_queries
+                                  if 'posts_follow' in query['sql']]
+                self.assertLessEqual(len(follow_queries), 1)
+
     def test_post_detail_page_show(self):
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
@@ -149,6 +163,63 @@ class PostPagesTests(TestCase):
         self.assertEqual(context_comment, self.comment)
         PostPagesTests.get_assert_context(self, context_post)
 
+    @override_settings(COMMENTS_PER_PAGE=3)
+    def test_post_detail_comments_paginated(self):
+        for i in range(4):
+            Comment.objects.create(
+                author=self.user, text=f'Комментарий {i}', post=self.post)
+        comments = list(self.post.comments.all())
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        page = response.context['comments']
+        self.assertEqual(list(page), comments[:3])
+
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+            {'after': page.next_cursor},
+        )
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertEqual(list(response.context['comments']), comments[3:])
+        self.assertFalse(response.context['comments'].has_next())
+
+    def test_post_image_uses_ready_thumbnail(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertContains(self.client.get(url), self.post.image.url)
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image.name, '360x339')
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(self.client.get(url), thumbnail.url)
+
+    def test_thumbnail_refreshes_cached_follow_feed(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.post.author)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        self.assertContains(client.get(url), self.post.image.url)
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image.name, thumbnails.FEED)
+        self.assertContains(client.get(url), thumbnail.url)
+
+    def test_page_thumbnails_resolved_in_one_query(self):
+        thumbnails.generate(self.post.image.name)
+        image_posts = [
+            Post.objects.create(
+                author=self.post_author, text=f'С картинкой {i}',
+                image=self.post.image.name)
+            for i in range(3)
+        ]
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        thumbnail = thumbnails.lookup(self.post.image.name, thumbnails.FEED)
+        self.assertContains(
+            response, thumbnail.url, count=len(image_posts) + 1)
+
     def test_post_create_context(self):
         fields = {
             'text': forms.fields.CharField,
@@ -229,15 +300,75 @@ class PostPagesTests(TestCase):
                     page_2_posts
                 )
 
+    def test_cursor_paginator_walks_feed(self):
+        url = reverse('posts:index')
+        posts = list(Post.objects.all())
+        first_page = self.authorized_client.get(url, {'after': ''})
+        page_obj = first_page.context['page_obj']
+        self.assertEqual(list(page_obj), posts[:CONST])
+        self.assertFalse(page_obj.has_previous())
+
+        second_page = self.authorized_client.get(
+            url, {'after': page_obj.next_cursor})
+        page_obj = second_page.context['page_obj']
+        self.assertEqual(list(page_obj), posts[CONST:2 * CONST])
+        self.assertTrue(page_obj.has_previous())
+
+        back_page = self.authorized_client.get(
+            url, {'before': page_obj.previous_cursor})
+        self.assertEqual(
+            list(back_page.context['page_obj']), posts[:CONST])
+
+    def test_cursor_paginator_broken_token(self):
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url, {'after': 'not-a-token'})
+        self.assertEqual(len(response.context['page_obj']), CONST)
+        first_page = self.authorized_client.get(url, {'after': ''})
+        for token in ('not-a-token', 'other-garbage'):
+            with self.subTest(token=token):
+                response = self.authorized_client.get(url, {'before': token})
+                self.assertEqual(response.context['page_key'],
+                                 first_page.context['page_key'])
+
+    def test_profile_cursor_page_shows_posts_count(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        count = self.user.posts.count()
+        response = self.authorized_client.get(url, {'after': ''})
+        self.assertEqual(response.context['posts_count'], count)
+        self.assertContains(response, f'Всего постов: {count}')
+
     def test_cach(self):
         page_content = self.client.get(reverse('posts:index')).content
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         cached_content = self.client.get(reverse('posts:index')).content
         self.assertEqual(page_content, cached_content)
         cache.clear()
         cleared_cache = self.client.get(reverse('posts:index')).content
         self.assertNotEqual(cached_content, cleared_cache)
 
+    def test_cache_invalidated_by_post_changes(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                page_content = self.client.get(page).content
+                self.post.text = f'Новый текст для {page}'
+                self.post.save()
+                self.assertContains(self.client.get(page), self.post.text)
+                self.assertNotEqual(
+                    page_content, self.client.get(page).content)
+
+    def test_cache_not_invalidated_by_other_group(self):
+        page = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        page_content = self.client.get(page).content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        Post.objects.create(
+            author=self.post_author, group=self.group_2, text='Другая группа')
+        self.assertEqual(page_content, self.client.get(page).content)
+
     def test_authorized_user_subscribe(self):
         self.authorized_client.get(
             reverse('posts:profile_follow', args=['post_author'])
@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+class WarmingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_command_warms_top_pages(self):
+        out = StringIO()
+        call_command(
+            'warm_caches', '--host', 'testserver', '--index-pages', '1',
+            stdout=out)
+        self.assertIn('Прогрето ключей: 3 из 3 страниц', out.getvalue())
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', kwargs={'slug': 'group'}),
+                    reverse('posts:profile', kwargs={'username': 'author'})):
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(CACHE_WARMING=True)
+    def test_new_post_pages_warmed(self):
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Свежий пост', 'group': self.group.pk})
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Свежий пост')
+
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertTemplateNotUsed(response, 'posts/includes/posts.html')
+        self.assertContains(response, 'Свежий пост')
+
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertContains(response, 'Свежий пост')
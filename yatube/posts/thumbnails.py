@@ -0,0 +1,148 @@
+"""Генерация миниатюр картинок старых постов.
+
+Шаблоны не вызывают {% thumbnail %}, а только читают уже готовую
+миниатюру из key-value store sorl (см. templatetags/post_images.py).
+Новые загрузки получают варианты картинки (posts/images.py), и шаблоны
+берут их, а не миниатюры sorl. Миниатюры всех размеров, что используют
+шаблоны, нужны только старым постам без вариантов: их режет в пуле
+процессов команда generate_thumbnails. Для страницы ленты готовые
+миниатюры находятся разом через attach().
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore
+
+from core import versions
+from . import feed, scopes
+from .models import Post
+
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Размеры из шаблонов: лента, страница поста, страница группы.
+FEED = '960x339'
+DETAIL = '360x339'
+GROUP = '9360x960'
+GEOMETRIES = (FEED, DETAIL, GROUP)
+
+
+def _full_options(source, options):
+    """Дополняет опции так же, как ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(name, geometry):
+    """Файл миниатюры, который sorl создаст для картинки name."""
+    source = ImageFile(name)
+    options = _full_options(source, THUMBNAIL_OPTIONS)
+    return ImageFile(
+        default.backend._get_thumbnail_filename(source, geometry, options),
+        default.storage,
+    )
+
+
+def lookup(name, geometry):
+    """Готовая миниатюра или None; картинку при этом не открывает."""
+    return default.kvstore.get(thumbnail_file(name, geometry))
+
+
+def lookup_many(pairs):
+    """Готовые миниатюры для пар (имя, геометрия) за один проход.
+
+    Ключи читаются одним cache.get_many, промахи — одним запросом
+    к таблице KVStore sorl; отсутствие записи тоже кешируется, как это
+    делает сам cached_db KVStore.
+    """
+    kvstore = default.kvstore
+    pairs = set(pairs)
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {pair: lookup(*pair) for pair in pairs}
+    keys = {pair: add_prefix(thumbnail_file(*pair).key) for pair in pairs}
+    values = kvstore.cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                   for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    result = {}
+    for pair, key in keys.items():
+        value = values.get(key)
+        if value is None or value == cached_db_kvstore.EMPTY_VALUE:
+            result[pair] = None
+        else:
+            result[pair] = deserialize_image_file(value)
+    return result
+
+
+def attach(posts, geometry):
+    """Раскладывает по постам страницы их готовые миниатюры.
+
+    Подходит как transform для get_page_context: шаблонный тег
+    post_image берёт миниатюру из post.prepared_thumbnails и сам
+    в key-value store не ходит. Посты с вариантами картинки
+    (prefetch_related('image_variants')) пропускаются.
+    """
+    posts = list(posts)
+    pending = [post for post in posts
+               if post.image and not post.image_variants.all()]
+    found = lookup_many((post.image.name, geometry) for post in pending)
+    for post in pending:
+        post.prepared_thumbnails = {
+            geometry: found[(post.image.name, geometry)]}
+    return posts
+
+
+def generate(name):
+    """Режет все миниатюры картинки; выполняется в процессе пула."""
+    for geometry in GEOMETRIES:
+        get_thumbnail(name, geometry, **THUMBNAIL_OPTIONS)
+    _invalidate_pages(name)
+    return name
+
+
+def _invalidate_pages(name):
+    # Закешированные страницы показывают оригинал вместо миниатюры,
+    # пока их не пересоберут.
+    affected, authors = [scopes.INDEX], set()
+    for post_id, author_id, group_id in Post.objects.filter(
+            image=name).values_list('pk', 'author_id', 'group_id'):
+        affected += [scopes.post(post_id), scopes.author(author_id)]
+        authors.add(author_id)
+        if group_id is not None:
+            affected.append(scopes.group(group_id))
+    if authors:
+        affected.extend(
+            scopes.feed(user_id) for user_id in feed.followers(authors))
+    versions.bump(*affected)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
@@ -1,13 +1,240 @@
-from django.core.paginator import Paginator
+import collections.abc
+
+from django.core.paginator import Page, Paginator
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core import versions
+from .models import Comment
+
+CURSOR_KEYS = ('pub_date', 'id')
+
+
+class TransformedList(collections.abc.Sequence):
+    """Объекты страницы, пропущенные через transform при первом обращении.
+
+    Пока шаблон не прочитал страницу (например, фрагмент взят из кеша),
+    запрос к базе не выполняется.
+    """
+    def __init__(self, object_list, transform):
+        self.object_list = object_list
+        self.transform = transform
+
+    @cached_property
+    def _items(self):
+        return list(self.transform(self.object_list))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+
+class PostPaginator(Paginator):
+    """Paginator, пропускающий объекты страницы через transform.
+
+    Позволяет листать, например, записи ленты, а в шаблон отдавать посты.
+    Если передан count, COUNT(*) по queryset не выполняется.
+    """
+    def __init__(self, object_list, per_page, transform=None, count=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.transform = transform
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return super().count
+
+    def _get_page(self, object_list, number, paginator):
+        if self.transform is not None:
+            object_list = TransformedList(object_list, self.transform)
+        return Page(object_list, number, paginator)
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс Page, которым пользуются шаблоны, но вместо
+    номеров страниц отдаёт курсоры соседних страниц. Запрос выполняется
+    при первом обращении к объектам страницы.
+    """
+    is_cursor = True
+    number = None
+
+    def __init__(self, paginator, after=None, before=None):
+        self.paginator = paginator
+        self.after = after
+        self.before = before
+
+    def __repr__(self):
+        return '<Cursor page after=%r before=%r>' % (self.after, self.before)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @cached_property
+    def _result(self):
+        return self.paginator.fetch(after=self.after, before=self.before)
 
+    @property
+    def object_list(self):
+        return self._result[0]
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.CONST)
+    @property
+    def next_cursor(self):
+        return self._result[1]
+
+    @property
+    def previous_cursor(self):
+        return self._result[2]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def key(self):
+        """Ключ страницы для кеша по разобранному курсору.
+
+        Испорченный курсор открывает первую страницу и получает её ключ,
+        так что мусор в запросе не плодит копий первой страницы в кеше.
+        """
+        for name, cursor in (('before', self.before), ('after', self.after)):
+            if cursor is not None:
+                date, pk = cursor
+                return f'{name}:{date.isoformat()}|{pk}'
+        return 'after:'
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (дата, id) без COUNT(*) и OFFSET.
+
+    Курсор — непрозрачный токен с ключами крайней строки страницы;
+    следующая страница выбирается условием по индексу, поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    """
+    def __init__(self, queryset, per_page, keys=CURSOR_KEYS, transform=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = keys
+        self.transform = transform
+
+    def encode(self, row):
+        date, pk = (getattr(row, key) for key in self.keys)
+        return urlsafe_base64_encode(f'{date.isoformat()}|{pk}'.encode())
+
+    def decode(self, token):
+        """Возвращает ключи из токена или None, если токен испорчен."""
+        try:
+            date, pk = force_str(urlsafe_base64_decode(token)).split('|')
+            date = parse_datetime(date)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return None
+        if date is None:
+            return None
+        return date, pk
+
+    def get_page(self, after=None, before=None):
+        after = after and self.decode(after)
+        before = before and self.decode(before)
+        return CursorPage(self, after=after or None, before=before or None)
+
+    def fetch(self, after=None, before=None):
+        """Возвращает объекты страницы и курсоры соседних страниц."""
+        date_key, pk_key = self.keys
+        if before is not None:
+            date, pk = before
+            rows = self.queryset.filter(
+                Q(**{f'{date_key}__gt': date})
+                | Q(**{date_key: date, f'{pk_key}__gt': pk})
+            ).order_by(date_key, pk_key)
+        else:
+            rows = self.queryset.order_by(f'-{date_key}', f'-{pk_key}')
+            if after is not None:
+                date, pk = after
+                rows = rows.filter(
+                    Q(**{f'{date_key}__lt': date})
+                    | Q(**{date_key: date, f'{pk_key}__lt': pk})
+                )
+        rows = list(rows[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before is not None:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after is not None
+        next_cursor = self.encode(rows[-1]) if rows and has_next else None
+        previous_cursor = (
+            self.encode(rows[0]) if rows and has_previous else None)
+        if self.transform is not None:
+            rows = self.transform(rows)
+        return rows, next_cursor, previous_cursor
+
+
+def get_page_context(queryset, request, transform=None, keys=CURSOR_KEYS,
+                     count=None):
+    """Собирает контекст страницы ленты.
+
+    `?page=N` листает обычным Paginator, `?after=`/`?before=` —
+    курсорным. count — функция, отдающая готовое число объектов
+    (например, из posts.counters); курсорному режиму оно не нужно.
+    `page_key` однозначно определяет страницу для кеша.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after is not None or before is not None:
+        paginator = CursorPaginator(
+            queryset, settings.CONST, keys=keys, transform=transform)
+        page_obj = paginator.get_page(after=after, before=before)
+        return {
+            'paginator': paginator,
+            'page_number': None,
+            'page_obj': page_obj,
+            'page_key': page_obj.key,
+        }
+    paginator = PostPaginator(
+        queryset, settings.CONST, transform=transform,
+        count=count() if count is not None else None)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {
         'paginator': paginator,
         'page_number': page_number,
         'page_obj': page_obj,
+        'page_key': page_obj.number,
+    }
+
+
+def get_comments_page(post_id, after=None):
+    """Порция комментариев поста, новые сверху, с авторами одним запросом."""
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, keys=('created', 'id'))
+    return paginator.get_page(after=after)
+
+
+def get_cache_context(scope):
+    """Версия и TTL для {% cache %} фрагмента области scope."""
+    return {
+        'cache_version': versions.get_version(scope),
+        'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     }
@@ -1,54 +1,143 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db.models import F
 from django.shortcuts import get_object_or_404, render, redirect
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
+from core import pagecache, singleflight, versions
+from . import counters, rows, scopes, search, thumbnails, warming
+from .feed import FEED_KEYS
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
-from .utils import get_page_context
+from .utils import get_cache_context, get_comments_page, get_page_context
+
+
+def _cards(geometry):
+    """transform страницы ленты: лёгкие строки с готовыми миниатюрами."""
+    return lambda values: thumbnails.attach(rows.build(values), geometry)
 
 
 def index(request):
-    posts = Post.objects.select_related('group').all()
-    context = get_page_context(posts, request)
+    posts = rows.post_values(Post.objects.all())
+    context = get_page_context(
+        posts, request, _cards(thumbnails.FEED),
+        count=counters.posts_count)
+    context.update(get_cache_context(scopes.INDEX))
+    pagecache.depends_on(request, scopes.INDEX)
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    posts = rows.post_values(group.posts.all())
     context = {
         'group': group
     }
-    context.update(get_page_context(posts, request))
+    context.update(get_page_context(
+        posts, request, _cards(thumbnails.GROUP),
+        count=lambda: counters.group_posts_count(group.pk)))
+    context.update(get_cache_context(scopes.group(group.pk)))
+    pagecache.depends_on(request, scopes.group(group.pk))
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group')
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+    posts = rows.post_values(author.posts.all())
+    # Число постов берётся из счётчика: у курсорной страницы нет count.
+    posts_count = counters.author_posts_count(author.pk)
     context = {
         'author': author,
-        'following': following,
+        'posts_count': posts_count,
     }
-    context.update(get_page_context(posts, request))
+    context.update(get_page_context(
+        posts, request, _cards(thumbnails.FEED),
+        count=lambda: posts_count))
+    context.update(get_cache_context(scopes.author(author.pk)))
+    pagecache.depends_on(request, scopes.author(author.pk))
     return render(request, 'posts/profile.html', context)
 
 
+def _post_state(request, post_id):
+    """Версия и автор поста — один запрос на запрос."""
+    if not hasattr(request, 'post_state'):
+        request.post_state = Post.objects.filter(pk=post_id).values_list(
+            'version', 'author_id').first()
+    return request.post_state
+
+
+def _post_etag(request, post_id):
+    # Кроме версии поста страница зависит от счётчиков автора
+    # (его область версий) и от того, кто её смотрит.
+    state = _post_state(request, post_id)
+    if state is None or CookieStorage.cookie_name in request.COOKIES:
+        return None
+    version, author_id = state
+    scope_versions = versions.get_versions(
+        scopes.post(post_id), scopes.author(author_id)).values()
+    return pagecache.personal_etag(request, '-'.join(
+        str(part) for part in (post_id, version, *scope_versions)))
+
+
+# Last-Modified не ставим: правки автора и группы не меняют дату поста,
+# и запрос с одним If-Modified-Since получил бы устаревший 304.
+@condition(etag_func=_post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group')
+        .prefetch_related('image_variants'),
+        pk=post_id,
+    )
     form = CommentForm(request.POST or None)
+    comments = get_comments_page(post.pk)
     context = {
         'post': post,
+        'post_id': post.pk,
         'comments': comments,
         'form': form,
+        'author_posts_count': counters.author_posts_count(post.author_id),
+        'comments_count': counters.comments_count(post.pk),
     }
+    # Карточка показывает счётчик постов автора и название группы,
+    # их изменения сдвигают версию автора. ETag ставит condition().
+    pagecache.depends_on(
+        request, scopes.post(post.pk), scopes.author(post.author_id))
     return render(request, "posts/post_detail.html", context)
 
 
+def comment_list(request, post_id):
+    """Фрагмент со следующей порцией комментариев для post_detail."""
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(post_id, request.GET.get('after')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@singleflight.cache_view(settings.PAGE_CACHE_TIMEOUT, scopes.INDEX)
+def post_search(request):
+    """Полнотекстовый поиск по постам, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(
+        search.to_match(query),
+        settings.CONST,
+        Post.objects.select_related(
+            'author', 'group').prefetch_related('image_variants'),
+        partial(thumbnails.attach, geometry=thumbnails.FEED),
+    )
+    context = {
+        'query': query,
+        'extra_query': urlencode({'q': query}) + '&',
+        'page_obj': paginator.get_page(
+            after=request.GET.get('after'), before=request.GET.get('before')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -59,6 +148,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        warming.after_post_created(request, post)
         return redirect('posts:profile', username=request.user.username)
     else:
         context = {
@@ -78,6 +168,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
+        post.version = F('version') + 1
         form.save()
         return redirect('posts:post_detail', post_id)
 
@@ -94,17 +185,21 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        Post.touch(post.pk)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    following = Post.objects.filter(
-        author__following__user=request.user).select_related('author')
+    following = rows.feed_values(request.user.feed.all())
     context = {
         'following ': following,
     }
-    context.update(get_page_context(following, request))
+    context.update(get_page_context(
+        following, request,
+        _cards(thumbnails.FEED),
+        keys=FEED_KEYS))
+    context.update(get_cache_context(scopes.feed(request.user.pk)))
     return render(request, 'posts/follow.html', context)
 
 
@@ -0,0 +1,81 @@
+"""Прогрев кеша первых страниц после публикации и перед стартом.
+
+Новый пост сдвигает версии главной, профиля автора, группы и лент
+подписчиков, и первые читатели — сам автор и его подписчики — собирали
+бы эти страницы в своём запросе. after_post_created() ставит их
+пересборку в фоновый пул core.swr: анонимные версии проходят весь стек
+middleware (pagecache.render_anonymous), общее тело для вошедших
+и ленты подписчиков рендерятся от имени пользователя
+(pagecache.render_for_user). Фрагменты лент общие для обоих путей.
+
+Перед стартом воркера те же функции вызывает команда warm_caches.
+"""
+from django.conf import settings
+from django.db.models import Count, F
+from django.urls import reverse
+
+from core import pagecache, swr
+from .models import Group, User
+
+
+def post_pages(post):
+    """Первые страницы, на которых появляется пост."""
+    paths = [
+        reverse('posts:index'),
+        reverse('posts:profile', kwargs={'username': post.author.username}),
+    ]
+    if post.group_id is not None:
+        paths.append(
+            reverse('posts:group_list', kwargs={'slug': post.group.slug}))
+    return paths
+
+
+def warm(environ, paths, user=None, readers=()):
+    """Пересобирает страницы paths и ленты readers.
+
+    Возвращает число ключей кеша страниц, которые после этого на месте.
+    """
+    warmed = 0
+    for path in paths:
+        page = pagecache.with_path(environ, path)
+        warmed += pagecache.render_anonymous(page)
+        if user is not None:
+            warmed += pagecache.render_for_user(page, user)
+    feed = pagecache.with_path(environ, reverse('posts:follow_index'))
+    for reader in readers:
+        pagecache.render_for_user(feed, reader)
+    return warmed
+
+
+def after_post_created(request, post):
+    """Прогревает в фоне страницы, куда попал новый пост."""
+    if not settings.CACHE_WARMING:
+        return
+    environ = pagecache.refresh_environ(request, reverse('posts:index'))
+    paths = post_pages(post)
+    readers = list(User.objects.filter(
+        follower__author_id=post.author_id,
+    ).order_by(F('last_login').desc(nulls_last=True))[
+        :settings.CACHE_WARM_READERS])
+    swr.submit(
+        f'warm:post:{post.pk}',
+        lambda: warm(environ, paths, post.author, readers))
+
+
+def top_pages(groups, profiles, index_pages):
+    """Главная и самые наполненные группы и профили."""
+    paths = [reverse('posts:index')]
+    paths.extend(
+        f"{reverse('posts:index')}?page={number}"
+        for number in range(2, index_pages + 1))
+    paths.extend(
+        reverse('posts:group_list', kwargs={'slug': slug})
+        for slug in Group.objects.annotate(
+            size=Count('posts')).order_by('-size').values_list(
+            'slug', flat=True)[:groups])
+    paths.extend(
+        reverse('posts:profile', kwargs={'username': username})
+        for username in User.objects.annotate(
+            size=Count('posts')).filter(size__gt=0).order_by(
+            '-size').values_list('username', flat=True)[:profiles])
+    return paths
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -30,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,7 +43,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PunchedPageCacheMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -71,6 +80,48 @@ DATABASES = {
     }
 }
 
+# Реплики — копии основной базы, которые обновляет sync_replicas;
+# их число задаётся переменной окружения DATABASE_REPLICAS.
+DATABASE_REPLICAS = []
+for number in range(int(os.getenv('DATABASE_REPLICAS', 0))):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Страницы, которые читают ленты с реплик (см. core/replicas.py).
+REPLICA_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+}
+# После записи пользователь столько секунд читает из основной базы.
+REPLICA_STICKY_COOKIE = 'read_primary'
+REPLICA_STICKY_SECONDS = 10
+# Как часто sync_replicas обновляет копии по умолчанию.
+REPLICA_SYNC_INTERVAL = 5
+
+# Включаются на каждом соединении SQLite (core/sqlite.py).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Фоновый checkpoint журнала в процессах WSGI; None — выключен.
+SQLITE_CHECKPOINT_INTERVAL = 60
+SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+SQLITE_WAL_LIMIT = 64 * 1024 * 1024
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,8 +154,19 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic кладёт сюда файлы с хешами в именах и их копии .gz/.br;
+# раздаёт их core.middleware.StaticFilesMiddleware (см. core/staticfiles.py).
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
+# Срок кеширования статики с хешем в имени: она никогда не меняется.
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
 CONST = 10
 
+COMMENTS_PER_PAGE = 20
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -118,12 +180,81 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для всех процессов кеш в файле SQLite (core/cache.py), а перед
+# ним — L1 в памяти процесса; LOCATION default — файл поколений L1.
+# Тесты получают свои файлы, чтобы не видеть кеш dev-сервера
+# и прошлых прогонов.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3'))
+if TESTING:
+    # Каталог со всеми файлами кеша (журналы SQLite, поколения L1)
+    # удаляется при выходе процесса.
+    _test_cache_dir = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    atexit.register(shutil.rmtree, _test_cache_dir, ignore_errors=True)
+    CACHE_LOCATION = os.path.join(_test_cache_dir, 'cache.sqlite3')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': f'{CACHE_LOCATION}.generation',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 2,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
+    },
 }
 
+# Фрагменты лент инвалидируются версиями (core.versions), а не по времени.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# core.singleflight: сколько живёт блокировка пересборки и сколько
+# остальные запросы ждут её результат, прежде чем считать сами.
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT = 5
+
+# core.swr: через SWR_SOFT_TIMEOUT секунд фрагменты и страницы отдаются
+# устаревшими, а пересобираются в фоне из SWR_REFRESH_WORKERS потоков;
+# жёсткий срок — PAGE_CACHE_TIMEOUT. 0 потоков — пересборка в запросе.
+SWR_SOFT_TIMEOUT = 60 * 5
+SWR_REFRESH_WORKERS = 0 if TESTING else 2
+
+# posts.warming: после публикации пересобирать в фоне первые страницы
+# и ленты стольких подписчиков автора (недавно входившие — первыми).
+CACHE_WARMING = not TESTING
+CACHE_WARM_READERS = 50
+
+# Максимум SQL-запросов на страницу по имени URL; см. core.queries.
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 7,
+    'posts:profile': 8,
+    'posts:post_detail': 8,
+    'posts:search': 5,
+    'posts:comments': 3,
+    'posts:follow_index': 6,
+}
+
+# Шаги EXPLAIN QUERY PLAN, допустимые на странице (см. core/plans.py):
+# выдачу FTS5 нельзя отсортировать по rank без временного B-дерева.
+QUERY_PLAN_ALLOWED = {
+    'posts:search': ('USE TEMP B-TREE FOR ORDER BY',),
+}
+
+# None — не проверять, 'warn' — писать в лог, 'raise' — бросать исключение.
+QUERY_BUDGET_MODE = 'warn' if DEBUG else None
+
+# Загруженные картинки ужимаются до этого размера и режутся по ширинам.
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_WIDTHS = (360, 960)
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]